@@ -0,0 +1,171 @@
+# Static analysis of BF programs, to settle what can be settled without running them.
+# cost_function uses this before running a program: unbalanced programs and loops that can be shown never to end are
+#   inviable straight away, instead of after compiling or after using up their whole timeout.
+
+from collections import namedtuple
+from math import gcd
+
+# balanced: whether every [ has a matching ]
+# never_halts: the index of a loop that is sure to run forever whatever the input, or None if none was found. Only loops
+#   whose bodies print nothing are reported, so stopping early on output never changes the answer.
+# has_output: whether the program has a . at all; if not, its output is always empty
+# loop_free: whether the program has no loops, and so always halts after len(code) steps
+ProgramAnalysis = namedtuple("ProgramAnalysis", ['balanced', 'never_halts', 'has_output', 'loop_free'])
+
+# Adjacent pairs that do nothing under each pointer policy. <> is not one under 'clamp', as at cell 0 the < is clamped;
+#   under 'error', neither move can be dropped, as either might leave the tape.
+NO_OP_PAIRS = {'clamp': ('+-', '-+', '><'), 'wrap': ('+-', '-+', '><', '<>'), 'error': ('+-', '-+')}
+
+
+def is_balanced(code):
+    """
+    Check brackets without copying or compiling the program
+    :param code: The BF program
+    :return: bool
+    """
+    depth = 0
+    for command in code:
+        if command == '[':
+            depth += 1
+        elif command == ']':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def find_infinite_loop(code, pointer_policy='clamp', tape_size=None):
+    """
+    Follow the program from the start while every cell it looks at is known, looking for a loop that cannot end.
+    Cells start at 0, so until the first , or a loop that cannot be followed, the tape is known exactly. A loop entered on
+    a known nonzero cell, whose body has no nested loops, I/O or net movement, changes its counter by the same d on each
+    pass; with 8-bit cells it ends if and only if gcd(d, 256) divides the counter. So [] and [>+<] on a nonzero cell never
+    end, and nor does [++] on an odd one, but [+] always does.
+    :param code: A balanced BF program
+    :param pointer_policy: As in interpret.execute; under 'wrap' and 'error', following stops at the edges of the tape
+    :param tape_size: The tape size for 'wrap' and 'error'
+    :return: The index of the [ of a loop that never ends, or None
+    """
+    cells = {}  # Known cells; missing ones are 0, and None means unknown
+    cellptr = 0
+    position = 0
+    while position < len(code):
+        command = code[position]
+        if command in '+-':
+            if cells.get(cellptr, 0) is not None:
+                cells[cellptr] = (cells.get(cellptr, 0) + (1 if command == '+' else -1)) & 255
+        elif command in '<>':
+            cellptr += 1 if command == '>' else -1
+            if cellptr < 0:
+                if pointer_policy != 'clamp':
+                    return None
+                cellptr = 0
+            elif tape_size is not None and pointer_policy != 'clamp' and cellptr >= tape_size:
+                return None
+        elif command == ',':
+            cells[cellptr] = None
+        elif command == '[':
+            close = position + 1
+            depth = 1
+            while depth:
+                depth += {'[': 1, ']': -1}.get(code[close], 0)
+                close += 1
+            close -= 1  # Now the index of the matching ]
+            counter = cells.get(cellptr, 0)
+            if counter == 0:
+                # A dead loop; skip it
+                position = close + 1
+                continue
+            body = code[position + 1:close]
+            if counter is None or any(command in body for command in '[.,'):
+                return None
+            offset, min_offset, max_offset = 0, 0, 0
+            deltas = {}
+            for command in body:
+                if command in '<>':
+                    offset += 1 if command == '>' else -1
+                    min_offset, max_offset = min(min_offset, offset), max(max_offset, offset)
+                elif command in '+-':
+                    deltas[offset] = deltas.get(offset, 0) + (1 if command == '+' else -1)
+            if offset != 0 or cellptr + min_offset < 0:
+                return None
+            if tape_size is not None and pointer_policy != 'clamp' and cellptr + max_offset >= tape_size:
+                return None
+            if counter % gcd(deltas.get(0, 0) % 256, 256) != 0:
+                return position
+            # It ends with its counter at 0; the other cells it changed are no longer followed
+            for changed in deltas:
+                cells[cellptr + changed] = None
+            cells[cellptr] = 0
+            position = close
+        position += 1
+    return None
+
+
+def analyze_program(code, pointer_policy='clamp', tape_size=None):
+    """
+    Find out what can be known about a program without running it
+    :param code: The BF program
+    :param pointer_policy: As in interpret.execute
+    :param tape_size: As in interpret.execute
+    :return: A ProgramAnalysis
+    """
+    balanced = is_balanced(code)
+    loop_free = '[' not in code
+    never_halts = None
+    if balanced and not loop_free:
+        never_halts = find_infinite_loop(code, pointer_policy, tape_size)
+    return ProgramAnalysis(balanced=balanced, never_halts=never_halts, has_output='.' in code, loop_free=loop_free)
+
+
+def _simplify_pass(code, no_op_pairs, keep_moves):
+    simplified = []
+    known_zero = [True]  # Whether the current cell is known to be 0 after each prefix of simplified
+    position = 0
+    while position < len(code):
+        command = code[position]
+        if command == '[' and known_zero[-1]:
+            # A dead loop: the cell is 0, at the start and after every loop, so the body never runs
+            depth = 1
+            while depth:
+                position += 1
+                depth += {'[': 1, ']': -1}.get(code[position], 0)
+        elif simplified and simplified[-1] + command in no_op_pairs:
+            simplified.pop()
+            known_zero.pop()
+        else:
+            simplified.append(command)
+            if command == ']':
+                known_zero.append(True)
+            elif command == '.':
+                known_zero.append(known_zero[-1])
+            else:
+                known_zero.append(False)
+        position += 1
+    # Nothing after the last . or loop can affect the output. Loops are kept, as a loop that never ends still would, and
+    #   so are moves that might leave the tape.
+    kept = '.[]<>' if keep_moves else '.[]'
+    end = len(simplified)
+    while end > 0 and simplified[end - 1] not in kept:
+        end -= 1
+    return simplified[:end]
+
+
+def simplify_program(code, pointer_policy='clamp'):
+    """
+    Shorten a program without changing its output on any input, by removing pairs that do nothing, loops that can never
+    run, and code at the end that cannot affect the output. The result never runs for more steps than the original.
+    :param code: The BF program
+    :param pointer_policy: As in interpret.execute; it decides which moves can be dropped
+    :return: The simplified program; unbalanced programs are returned as they are
+    """
+    if not is_balanced(code):
+        return code
+    no_op_pairs = NO_OP_PAIRS[pointer_policy]
+    simplified = [command for command in code if command in '+-<>[].,']
+    while True:
+        shorter = _simplify_pass(simplified, no_op_pairs, pointer_policy == 'error')
+        if len(shorter) == len(simplified):
+            return "".join(shorter)
+        simplified = shorter
+
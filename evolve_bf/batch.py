@@ -0,0 +1,272 @@
+# Batch BF interpreter for evolve_bf
+# Runs many compiled programs on the same input in lockstep over NumPy arrays: one row of the tape matrix per program,
+#   with per-program code and cell pointers. Each pass over the arrays executes one op of every running program, so a
+#   generation of short programs costs a few array passes per op instead of one Python loop per program.
+
+from collections import namedtuple
+from itertools import chain
+from evolve_bf import interpret
+
+try:
+    import numpy
+except ImportError:  # NumPy is only needed for batch evaluation
+    numpy = None
+
+OP_HALT = interpret.OP_MULTIPLY + 1  # Pads every program's op row out to the longest program
+
+# Every field is a (programs x ops) array, padded with OP_HALT ops that do nothing else. Each op's effects are spread
+#   out into tables so that one lockstep pass can apply the common ones to every program without branching:
+# ops: the opcodes
+# adds: what the op adds to the current cell (OP_ADD only)
+# moves: how far the op moves the cell pointer (OP_MOVE only)
+# base_steps: the steps the op always costs; loop idioms add their iterations on top
+# zero_jumps, nonzero_jumps: where to jump if the current cell is zero / nonzero, or -1. OP_HALT jumps to just before
+#   itself, so a program that has finished stays parked on it.
+# body_weights: the body length of OP_CLEAR and OP_MULTIPLY loops
+# loop_steps, min_offsets, max_offsets: the MultiplyLoop fields (loop_steps also holds OP_CLEAR's step)
+# change_offsets, change_deltas: (programs x ops x changes) arrays of MultiplyLoop.changes, padded with 0 deltas
+ProgramBatch = namedtuple("ProgramBatch", ['ops', 'adds', 'moves', 'base_steps', 'zero_jumps', 'nonzero_jumps',
+                                           'body_weights', 'loop_steps', 'min_offsets', 'max_offsets',
+                                           'change_offsets', 'change_deltas'])
+
+
+def pack_programs(programs):
+    """
+    Pack compiled programs into the arrays run_batch works on
+    :param programs: A list of CompiledPrograms
+    :return: A ProgramBatch
+    """
+    if numpy is None:
+        raise ImportError("Batch evaluation requires NumPy.")
+    program_count = len(programs)
+    lengths = numpy.array([len(program.ops) for program in programs], dtype=numpy.int64)
+    op_count = int(lengths.max(initial=0)) + 1
+    change_count = max([len(loop.changes) for program in programs for loop in program.loops.values()] + [1])
+
+    # Flatten every program's lists, work out each op's table entries in one go, then scatter them into the rows
+    total = int(lengths.sum())
+    flat_ops = numpy.fromiter(chain.from_iterable(program.ops for program in programs), numpy.int64, total)
+    flat_args = numpy.fromiter(chain.from_iterable(program.args for program in programs), numpy.int64, total)
+    flat_weights = numpy.fromiter(chain.from_iterable(program.weights for program in programs), numpy.int64, total)
+    rows = numpy.repeat(numpy.arange(program_count), lengths)
+    columns = numpy.arange(total) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    is_add, is_move = flat_ops == interpret.OP_ADD, flat_ops == interpret.OP_MOVE
+    is_loop = (flat_ops == interpret.OP_CLEAR) | (flat_ops == interpret.OP_MULTIPLY)
+    is_zero_jump = (flat_ops == interpret.OP_OPEN) | (flat_ops == interpret.OP_MULTIPLY)
+
+    def table(flat_values, fill=0):
+        values = numpy.full((program_count, op_count), fill, dtype=numpy.int64)
+        values[rows, columns] = flat_values
+        return values
+
+    ops = table(flat_ops, OP_HALT)
+    adds = table(numpy.where(is_add, flat_args, 0))
+    moves = table(numpy.where(is_move, flat_args, 0))
+    base_steps = table(numpy.where(is_add | is_move, flat_weights, 1))
+    halt_jumps = numpy.arange(op_count) - 1
+    zero_jumps = table(numpy.where(is_zero_jump, flat_args, -1), halt_jumps)
+    nonzero_jumps = table(numpy.where(flat_ops == interpret.OP_CLOSE, flat_args, -1), halt_jumps)
+    body_weights = table(numpy.where(is_loop, flat_weights, 0))
+    loop_steps = table(numpy.where(flat_ops == interpret.OP_CLEAR, flat_args, 0))
+    min_offsets, max_offsets = table(0), table(0)
+    change_offsets = numpy.zeros((program_count, op_count, change_count), dtype=numpy.int64)
+    change_deltas = numpy.zeros((program_count, op_count, change_count), dtype=numpy.int64)
+
+    for row, program in enumerate(programs):
+        for column, loop in program.loops.items():
+            loop_steps[row, column] = loop.step
+            min_offsets[row, column] = loop.min_offset
+            max_offsets[row, column] = loop.max_offset
+            for change_index, (offset, delta) in enumerate(loop.changes):
+                change_offsets[row, column, change_index] = offset
+                change_deltas[row, column, change_index] = delta
+    return ProgramBatch(ops, adds, moves, base_steps, zero_jumps, nonzero_jumps, body_weights, loop_steps,
+                        min_offsets, max_offsets, change_offsets, change_deltas)
+
+
+def subset(batch, rows):
+    """
+    Select some programs from a ProgramBatch
+    :param batch: The ProgramBatch
+    :param rows: A list or array of program indices
+    :return: A ProgramBatch of just those programs
+    """
+    return ProgramBatch(*[field[rows] for field in batch])
+
+
+def _widen(array, size):
+    # Double the second dimension until it is more than size
+    new_width = array.shape[1]
+    while new_width <= size:
+        new_width *= 2
+    widened = numpy.zeros((array.shape[0], new_width), dtype=array.dtype)
+    widened[:, :array.shape[1]] = array
+    return widened
+
+
+def run_batch(batch, input_string, timeout=1000, return_time=False, programs=None, target=None, output_slack=None,
+              mismatch_bounds=None):
+    """
+    Run every program in a ProgramBatch on the same input, in lockstep
+    :param batch: A ProgramBatch from pack_programs
+    :param input_string: The input for , to read from; reading past its end gives 0. Bytes give bytes outputs, and a
+            PreparedText is read as it is, as in interpret.execute.
+    :param timeout: The step budget for each program, as with timeout_unit='steps' in interpret.evaluate
+    :param return_time: If True, return a tuple (outputs, steps), where steps is a list of steps executed
+    :param programs: The CompiledPrograms the batch was packed from. If given, the last few long-running programs are
+            finished by interpret.execute rather than in lockstep.
+    :param target: The expected output (or a PreparedText), for output_slack and mismatch_bounds; both stop programs the same way
+            interpret.execute does, and the output printed so far is returned
+    :param output_slack: Stop a program once its output is more than this many chars longer than target
+    :param mismatch_bounds: A list with, for each program, the mismatch (see interpret.ScoredRun) past which to stop it,
+            or None to let it run
+    :return: A list of output strings in batch order, with None for programs that ran over the budget
+    """
+    program_count, width = batch.ops.shape
+    prepared_input = interpret.prepare_input(input_string)
+    bytes_mode = prepared_input.bytes_mode
+    input_codes = numpy.frombuffer(prepared_input.codes, dtype=numpy.uint8).astype(numpy.int64)
+    input_length = len(input_codes) - 1  # The index of the terminator
+
+    outputs = [None] * program_count
+    final_steps = [0] * program_count
+
+    # State of the programs still running. Finished programs are parked on their last OP_HALT until enough of them
+    #   have piled up to be worth dropping from these arrays.
+    ids = numpy.arange(program_count)
+    running = numpy.ones(program_count, dtype=bool)
+    codeptrs = numpy.zeros(program_count, dtype=numpy.int64)
+    cellptrs = numpy.zeros(program_count, dtype=numpy.int64)
+    input_indices = numpy.zeros(program_count, dtype=numpy.int64)
+    steps = numpy.zeros(program_count, dtype=numpy.int64)
+    cells = numpy.zeros((program_count, 32), dtype=numpy.int64)
+    output = numpy.zeros((program_count, 32), dtype=numpy.uint8)
+    output_lengths = numpy.zeros(program_count, dtype=numpy.int64)
+
+    # Once only a few long-running programs are left, a pass over the arrays costs more than running them one at a
+    #   time, so they are finished (re-run from the start) by the scalar interpreter
+    straggler_limit = 16 if programs is not None else 0
+    target_length = len(interpret.char_codes(target)) if target is not None else None
+    output_limit = target_length + output_slack if target is not None and output_slack is not None else None
+    if target is not None and mismatch_bounds is not None:
+        target_codes = numpy.array(list(interpret.char_codes(target)) + [0], dtype=numpy.int64)
+        mismatches = numpy.zeros(program_count, dtype=numpy.int64)
+        row_bounds = numpy.array([numpy.inf if row_bound is None else row_bound for row_bound in mismatch_bounds],
+                                 dtype=numpy.float64)
+    else:
+        mismatches = row_bounds = None
+
+    while running.sum() > straggler_limit:
+        rows = numpy.arange(len(ids))
+        positions = ids * width + codeptrs
+        ops = batch.ops.take(positions)
+        cell_positions = rows * cells.shape[1] + cellptrs
+        current = cells.take(cell_positions)
+
+        # The common ops, applied to every row through the tables
+        new_current = (current + batch.adds.take(positions)) & 255
+        cellptrs = numpy.maximum(cellptrs + batch.moves.take(positions), 0)
+        steps += batch.base_steps.take(positions)
+        jumps = numpy.where(current == 0, batch.zero_jumps.take(positions), batch.nonzero_jumps.take(positions))
+        codeptrs = numpy.where(jumps >= 0, jumps, codeptrs)
+
+        op_counts = numpy.bincount(ops, minlength=OP_HALT + 1)
+        if op_counts[interpret.OP_OUTPUT]:
+            writing = rows[ops == interpret.OP_OUTPUT]
+            if output_lengths[writing].max() >= output.shape[1]:
+                output = _widen(output, output_lengths[writing].max())
+            output[writing, output_lengths[writing]] = current[writing]
+            if mismatches is not None:
+                expected = target_codes[numpy.minimum(output_lengths[writing], target_length)]
+                mismatches[writing] += numpy.where(output_lengths[writing] < target_length,
+                                                   numpy.abs(expected - current[writing]), current[writing])
+            output_lengths[writing] += 1
+        if op_counts[interpret.OP_INPUT]:
+            reading = rows[ops == interpret.OP_INPUT]
+            new_current[reading] = input_codes[numpy.minimum(input_indices[reading], input_length)]
+            input_indices[reading] += 1
+        if op_counts[interpret.OP_CLEAR]:
+            clearing = rows[ops == interpret.OP_CLEAR]
+            counts = current[clearing]
+            counts = numpy.where((batch.loop_steps.take(positions[clearing]) == 1) & (counts != 0), 256 - counts, counts)
+            # The [ once (already counted), then the body and the ] on every iteration
+            steps[clearing] += counts * (batch.body_weights.take(positions[clearing]) + 1)
+            new_current[clearing] = 0
+        cells.put(cell_positions, new_current)
+
+        if op_counts[interpret.OP_MULTIPLY]:
+            multiplying = rows[(ops == interpret.OP_MULTIPLY) & (current != 0)]
+            loop_positions = positions[multiplying]
+            # Programs whose body would hit the left edge of the tape fall through into the body like a plain [
+            fast = cellptrs[multiplying] + batch.min_offsets.take(loop_positions) >= 0
+            multiplying, loop_positions = multiplying[fast], loop_positions[fast]
+            if len(multiplying):
+                counts = current[multiplying]
+                counts = numpy.where(batch.loop_steps.take(loop_positions) == 1, 256 - counts, counts)
+                furthest = (cellptrs[multiplying] + batch.max_offsets.take(loop_positions)).max()
+                if furthest >= cells.shape[1]:
+                    cells = _widen(cells, furthest)
+                loop_ids, loop_columns = ids[multiplying], codeptrs[multiplying]
+                for change_index in range(batch.change_offsets.shape[2]):
+                    targets = cellptrs[multiplying] + batch.change_offsets[loop_ids, loop_columns, change_index]
+                    cells[multiplying, targets] = (cells[multiplying, targets] + counts *
+                                                   batch.change_deltas[loop_ids, loop_columns, change_index]) & 255
+                cells[multiplying, cellptrs[multiplying]] = 0
+                # The body and the ] on every iteration
+                steps[multiplying] += counts * (batch.body_weights.take(loop_positions) + 1)
+                codeptrs[multiplying] = batch.zero_jumps.take(loop_positions)
+        codeptrs += 1
+
+        if cellptrs.max() >= cells.shape[1]:
+            cells = _widen(cells, cellptrs.max())
+
+        # Steps only ever go up, so a program that is over budget now would be over budget when it halted; checking
+        #   every pass gives the same result as interpret.execute's checks on backward jumps.
+        timed_out = steps > timeout
+        finished = (timed_out | (ops == OP_HALT)) & running
+        if output_limit is not None:
+            finished |= (output_lengths > output_limit) & running
+        if mismatches is not None:
+            finished |= (mismatches > row_bounds) & running
+        if finished.any():
+            for row in rows[finished].tolist():
+                final_steps[ids[row]] = int(steps[row])
+                if not timed_out[row]:
+                    row_output = output[row, :output_lengths[row]].tobytes()
+                    outputs[ids[row]] = row_output if bytes_mode else row_output.decode('latin-1')
+            running[finished] = False
+            codeptrs[finished] = width - 1
+            if running.sum() * 4 <= len(ids) * 3:
+                ids, codeptrs, cellptrs = ids[running], codeptrs[running], cellptrs[running]
+                input_indices, steps, output_lengths = input_indices[running], steps[running], output_lengths[running]
+                if mismatches is not None:
+                    mismatches, row_bounds = mismatches[running], row_bounds[running]
+                cells, output, running = cells[running], output[running], running[running]
+
+    for program_id in ids[running].tolist():
+        try:
+            scored_run = interpret.execute(programs[program_id], prepared_input, timeout, timeout_unit='steps',
+                                           target='' if target is None else target, output_slack=output_slack,
+                                           mismatch_bound=None if mismatches is None else mismatch_bounds[program_id])
+            outputs[program_id], final_steps[program_id] = scored_run.output, scored_run.elapsed
+        except interpret.TimeoutAbortException:
+            final_steps[program_id] = timeout + 1
+
+    if return_time:
+        return (outputs, final_steps)
+    return outputs
+
+
+def evaluate_batch(programs, input_string, timeout=1000, return_time=False):
+    """
+    Run many BF programs on the same input
+    :param programs: A list of BF programs, as strings or CompiledPrograms
+    :param input_string: The input for every program
+    :param timeout: The step budget for each program
+    :param return_time: If True, return a tuple (outputs, steps)
+    :return: A list of output strings, with None for programs that ran over the budget. Raises BFSyntaxException if any
+            program has unbalanced brackets.
+    """
+    programs = [program if isinstance(program, interpret.CompiledProgram) else interpret.compile_program(program)
+                for program in programs]
+    return run_batch(pack_programs(programs), input_string, timeout, return_time, programs)
@@ -0,0 +1,151 @@
+# Benchmarks for the hot paths of evolve_bf: the interpreter, the cost function and whole generations.
+# Everything runs on step budgets and fixed seeds, so two runs on the same machine do the same work and their numbers
+#   can be compared directly. Run it with:
+#   python -m evolve_bf.benchmark [--repeat N] [--seed S] [--output results.json]
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from evolve_bf import interpret, cost, evolve
+
+# The fixed corpus for the interpreter benchmark: name -> (program, input, step budget)
+# The timeout-bound program never halts, so it measures how fast the interpreter burns through a budget.
+CORPUS = {
+    'hello_world': ("++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.+++++++..+++.>>.<-.<.+++.------.--------."
+                    ">>+.>++.", "", 100000),
+    'cat': (",[.,]", "The quick brown fox jumps over the lazy dog. " * 20, 100000),
+    'loop_heavy': ("++++++++++++++++[>++++++++++++++++[>++++++++++++++++[>+.<-]<-]<-]", "", 1000000),
+    'timeout_bound': ("+[>+<]", "", 100000),
+}
+
+# The problem used for the cost function and evolution benchmarks
+BENCHMARK_INPUTS = ['ab', 'xyz', 'Hello, world!']
+BENCHMARK_TARGETS = ['ab', 'xyz', 'Hello, world!']
+BENCHMARK_TIMEOUT = 2000  # In steps
+
+
+def best_time(function, repeat):
+    """
+    Time a function, keeping the fastest of several runs as timeit does; slower runs only measure machine noise
+    :param function: A function of no arguments
+    :param repeat: How many times to run it
+    :return: A tuple (fastest run in seconds, the function's return value)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        time_begin = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - time_begin)
+    return (best, result)
+
+
+def benchmark_evaluate(repeat=5, runs=20):
+    """
+    Time interpret.evaluate on each program of CORPUS
+    :param repeat: How many timings to take the best of
+    :param runs: How many times to run the program per timing
+    :return: A dict of name -> {'ops_per_sec', 'evals_per_sec', 'steps'}
+    """
+    results = {}
+    for name, (program, input_string, budget) in sorted(CORPUS.items()):
+        compiled_program = interpret.compile_program(program)
+
+        def run():
+            steps = 0
+            for _ in range(runs):
+                try:
+                    steps += interpret.evaluate(compiled_program, input_string, budget, return_time=True,
+                                                timeout_unit='steps')[1]
+                except interpret.TimeoutAbortException:
+                    steps += budget
+            return steps
+        elapsed, steps = best_time(run, repeat)
+        results[name] = {'ops_per_sec': steps / elapsed, 'evals_per_sec': runs / elapsed, 'steps': steps // runs}
+    return results
+
+
+def benchmark_cost_function(seed=0, repeat=5, population_size=500, program_size=16):
+    """
+    Time cost.cost_function on a seeded random population
+    :param seed: The seed for generating the population
+    :param repeat: How many timings to take the best of
+    :param population_size: How many programs to cost per timing
+    :param program_size: How long each generated program is
+    :return: A dict with 'evals_per_sec' and 'programs'
+    """
+    random.seed(seed)
+    population = evolve.generate_population(population_size, program_size)
+    cost_options = cost.default_cost_options._replace(program_timeout=BENCHMARK_TIMEOUT, timeout_unit='steps')
+
+    def run():
+        return [cost.cost_function(BENCHMARK_INPUTS, BENCHMARK_TARGETS, program, cost_options)
+                for program in population]
+    elapsed, _ = best_time(run, repeat)
+    return {'evals_per_sec': population_size / elapsed, 'programs': population_size}
+
+
+def benchmark_evolve(seed=0, repeat=3, population_size=200, backend='serial'):
+    """
+    Time whole runs of evolve.evolve_bf_program with a fixed seed
+    :param seed: The seed the RNG is reset to before each run, so every run evolves the same programs
+    :param repeat: How many timings to take the best of
+    :param population_size: The population size for the run
+    :param backend: The evaluation_backend for the run
+    :return: A dict with 'gens_per_sec', 'generations' and 'program'
+    """
+    cost_options = cost.default_cost_options._replace(program_timeout=BENCHMARK_TIMEOUT, timeout_unit='steps')
+    evolve_options = evolve.default_evolve_options._replace(population_size=population_size,
+                                                            program_timeout=BENCHMARK_TIMEOUT, timeout_unit='steps',
+                                                            cost_options=cost_options, evaluation_backend=backend)
+
+    def run():
+        random.seed(seed)
+        return evolve.evolve_bf_program(BENCHMARK_INPUTS[:2], BENCHMARK_TARGETS[:2], evolve_options)
+    elapsed, report = best_time(run, repeat)
+    # Generation numbers start at 0, so the winning generation is one more than its number
+    return {'gens_per_sec': (report.generations + 1) / elapsed, 'generations': report.generations,
+            'program': report.program}
+
+
+def run_benchmarks(seed=0, repeat=5, population_size=500, backend='serial'):
+    """
+    Run every benchmark
+    :param seed: The seed for the random populations and the evolution runs
+    :param repeat: How many timings to take the best of
+    :param population_size: The population size for the cost function benchmark
+    :param backend: The evaluation_backend for the evolution benchmark
+    :return: A dict of results, ready for json.dump
+    """
+    return {'python': platform.python_version(),
+            'seed': seed,
+            'repeat': repeat,
+            'evaluate': benchmark_evaluate(repeat),
+            'cost_function': benchmark_cost_function(seed, repeat, population_size),
+            'evolve': benchmark_evolve(seed, max(1, repeat // 2), backend=backend)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the interpreter, cost function and evolution loop.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the random populations and evolution runs")
+    parser.add_argument('--repeat', type=int, default=5, help="How many timings to take the best of")
+    parser.add_argument('--population-size', type=int, default=500, help="Programs per cost function timing")
+    parser.add_argument('--backend', default='serial', choices=evolve.evaluation.EVALUATION_BACKENDS,
+                        help="Evaluation backend for the evolution benchmark")
+    parser.add_argument('--output', '-o', help="Write the JSON here instead of to stdout")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.seed, args.repeat, args.population_size, args.backend)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
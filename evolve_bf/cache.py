@@ -0,0 +1,78 @@
+# Fitness memoization for evolve_bf.
+# Many programs in a generation are exact copies of each other, or differ only in code that cannot change the output,
+#   so their costs are cached under a normalized form of the program text.
+
+from collections import OrderedDict
+from evolve_bf import interpret, analysis
+
+_missing = object()
+
+
+def normalize_program(program, keep_timing=False, pointer_policy='clamp'):
+    """
+    Reduce a program to a canonical form with the same output
+    :param program: The BF program
+    :param keep_timing: If True, only strip non-BF characters, so programs that run for different numbers of steps are
+            kept apart (needed when time or length is part of the cost, or when the budget is counted in steps)
+    :param pointer_policy: As in interpret.execute; it decides which pairs do nothing (see analysis.NO_OP_PAIRS), and
+            under 'error' moves at the end are kept, as they may leave the tape
+    :return: The normalized program text
+    """
+    code = interpret.cleanup(program)
+    if keep_timing:
+        return "".join(code)
+    no_op_pairs = analysis.NO_OP_PAIRS[pointer_policy]
+    reduced = []
+    for command in code:
+        if reduced and reduced[-1] + command in no_op_pairs:
+            reduced.pop()
+        else:
+            reduced.append(command)
+    # Nothing after the last . or loop can affect the output
+    kept = '.[]<>' if pointer_policy == 'error' else '.[]'
+    end = len(reduced)
+    while end > 0 and reduced[end - 1] not in kept:
+        end -= 1
+    return "".join(reduced[:end])
+
+
+class FitnessCache(object):
+    """
+    A bounded least-recently-used map from normalized programs to costs, counting hits and misses; CachingEvaluator
+    keeps each cost with why the program was inviable, as a (cost, cause) pair
+    """
+    def __init__(self, size):
+        """
+        :param size: How many costs to keep
+        """
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, default=None):
+        """
+        Get a cached cost, counting a hit or a miss
+        :param key: The cache key
+        :param default: What to return on a miss
+        :return: The cached value, or default
+        """
+        value = self.entries.get(key, _missing)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
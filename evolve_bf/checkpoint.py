@@ -0,0 +1,47 @@
+# Checkpoints for long evolution runs.
+# A checkpoint holds everything evolve_bf_program needs to carry on from the start of a generation, so a resumed run
+#   makes the same programs as one that was never stopped (given a step budget; wall-clock timeouts vary anyway).
+# Checkpoints are gzipped pickles, written to a temporary file and renamed into place, so a crash while writing never
+#   leaves a half-written checkpoint behind.
+
+import gzip
+import os
+import pickle
+from collections import namedtuple
+
+# inputs, targets: the problem being evolved
+# options: the EvolveOptions of the run, with metrics_hook removed since it may not pickle
+# population: the programs about to be evaluated, packed in a population.Population
+# generation: the number of the generation about to be evaluated
+# last_cost, flat_generations, stagnant: stagnation tracking
+# cull_cost: the bound from the previous cull
+# best: the best MappedProgram seen so far, or None
+# random_state: random.getstate()
+# cache_state: (FitnessCache, cost options it was filled with) if the run has a fitness cache, else None
+Checkpoint = namedtuple("Checkpoint", ['inputs', 'targets', 'options', 'population', 'generation', 'last_cost',
+                                       'flat_generations', 'stagnant', 'cull_cost', 'best', 'random_state',
+                                       'cache_state'])
+
+CHECKPOINT_COMPRESSION = 6  # gzip level; checkpoints are mostly short, repetitive program text
+
+
+def save_checkpoint(path, checkpoint):
+    """
+    Write a checkpoint atomically
+    :param path: Where to write it; any checkpoint already there is replaced
+    :param checkpoint: A Checkpoint
+    """
+    temporary_path = path + ".tmp"
+    with gzip.open(temporary_path, 'wb', compresslevel=CHECKPOINT_COMPRESSION) as checkpoint_file:
+        pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint written by save_checkpoint. Only load checkpoints you wrote; they are pickles.
+    :param path: The checkpoint file
+    :return: A Checkpoint
+    """
+    with gzip.open(path, 'rb') as checkpoint_file:
+        return pickle.load(checkpoint_file)
@@ -0,0 +1,244 @@
+# Code generation backend for evolve_bf.
+# Instead of stepping through a CompiledProgram one op at a time, each program is turned into the source of a Python
+#   function with the same structure: runs of + and > become single statements, and loops become `while cells[p]:`
+#   blocks. The source is compiled with compile() once, and the function is kept in a bounded cache keyed by program
+#   text, so programs that survive for many generations are only generated once.
+# The generated function counts steps and checks the budget at exactly the points interpret.execute does, so it gives
+#   identical outputs, steps, mismatches and timeouts. Programs nested too deeply for Python to compile are run by
+#   interpret.execute instead.
+
+import time
+from collections import namedtuple
+from functools import partial
+from evolve_bf import interpret, cache
+
+CODE_CACHE_SIZE = 10000  # How many generated functions to keep
+
+# code: the cleaned program text
+# function: the generated function, or None if the program is run by interpret.execute instead
+# compiled: the CompiledProgram it was generated from
+GeneratedProgram = namedtuple("GeneratedProgram", ['code', 'function', 'compiled'])
+
+code_cache = cache.FitnessCache(CODE_CACHE_SIZE)
+
+_FUNCTION_HEADER = ("def run(cells, tape_length, input_codes, input_length, step_limit, time_target, target_codes, "
+                    "target_length, mismatch_bound, output_limit, timeout_error):")
+
+
+def _bounds_error(tape_length, op_index):
+    return interpret.TapeBoundsException("The cell pointer left the tape of {} cells at op {}.".format(tape_length,
+                                                                                                    op_index))
+
+
+def _emit_move(lines, indent, distance, op_index, pointer_policy):
+    lines.append(indent + "p += {}".format(distance))
+    if distance > 0:
+        if pointer_policy == 'clamp':
+            lines.append(indent + "if p >= tape_length: tape_length = grow_tape(cells, p)")
+        elif pointer_policy == 'wrap':
+            lines.append(indent + "if p >= tape_length: p %= tape_length")
+        else:
+            lines.append(indent + "if p >= tape_length: raise bounds_error(tape_length, {})".format(op_index))
+    else:
+        if pointer_policy == 'clamp':
+            lines.append(indent + "if p < 0: p = 0")
+        elif pointer_policy == 'wrap':
+            lines.append(indent + "if p < 0: p %= tape_length")
+        else:
+            lines.append(indent + "if p < 0: raise bounds_error(tape_length, {})".format(op_index))
+
+
+def _emit_loop(lines, indent, program, body_start, close, pointer_policy, scored, timed):
+    # A plain loop. The [ has already been counted; the ] is counted on every pass, and the budget checked whenever it
+    #   jumps back.
+    lines.append(indent + "while cells[p]:")
+    body_pending = _emit_ops(lines, indent + "    ", program, body_start, close, pointer_policy, scored, timed)
+    lines.append(indent + "    steps += {}".format(body_pending + 1))
+    if timed:
+        lines.append(indent + "    if cells[p] and time() > time_target: raise timeout_error(steps)")
+    else:
+        lines.append(indent + "    if cells[p] and steps > step_limit: raise timeout_error(steps)")
+
+
+def _emit_ops(lines, indent, program, start, end, pointer_policy, scored, timed):
+    """
+    Add the Python for ops[start:end] to lines
+    :return: Steps run by the last straight-line stretch and not yet added to steps
+    """
+    ops, args, weights = program.ops, program.args, program.weights
+    pending = 0  # Steps of straight-line code are added up and counted in one go before anything that can see them
+    op_index = start
+    while op_index < end:
+        op = ops[op_index]
+        if op == interpret.OP_ADD:
+            lines.append(indent + "cells[p] = (cells[p] + {}) & 255".format(args[op_index]))
+            pending += weights[op_index]
+        elif op == interpret.OP_MOVE:
+            _emit_move(lines, indent, args[op_index], op_index, pointer_policy)
+            pending += weights[op_index]
+        elif op == interpret.OP_INPUT:
+            lines.append(indent + "cells[p] = input_codes[i]")
+            lines.append(indent + "if i < input_length: i += 1")
+            pending += 1
+        elif op == interpret.OP_OUTPUT:
+            lines.append(indent + "steps += {}".format(pending + 1))
+            pending = 0
+            if scored:
+                lines.append(indent + "c = cells[p]")
+                lines.append(indent + "n = len(output)")
+                lines.append(indent + "mismatch += abs(target_codes[n] - c) if n < target_length else c")
+                lines.append(indent + "append(c)")
+                lines.append(indent + "if mismatch > mismatch_bound or n + 1 > output_limit: "
+                                      "return output, steps, mismatch, False")
+            else:
+                lines.append(indent + "append(cells[p])")
+        elif op == interpret.OP_CLEAR:
+            lines.append(indent + "count = cells[p]")
+            if args[op_index] == 1:
+                lines.append(indent + "if count: count = 256 - count")
+            lines.append(indent + "steps += {} + count * {}".format(pending + 1, weights[op_index] + 1))
+            lines.append(indent + "cells[p] = 0")
+            lines.append(indent + "if steps > step_limit: raise timeout_error(steps)")
+            pending = 0
+        elif op == interpret.OP_OPEN:
+            lines.append(indent + "steps += {}".format(pending + 1))
+            pending = 0
+            _emit_loop(lines, indent, program, op_index + 1, args[op_index], pointer_policy, scored, timed)
+            op_index = args[op_index]
+        elif op == interpret.OP_MULTIPLY:
+            loop = program.loops[op_index]
+            lines.append(indent + "steps += {}".format(pending + 1))
+            pending = 0
+            # Whether the body can be applied all at once, as in interpret.execute
+            conditions = ["cells[p]"]
+            if loop.min_offset < 0:
+                conditions.append("p >= {}".format(-loop.min_offset))
+            if pointer_policy != 'clamp':
+                conditions.append("p + {} < tape_length".format(loop.max_offset))
+            lines.append(indent + "if {}:".format(" and ".join(conditions)))
+            inner = indent + "    "
+            lines.append(inner + "count = {}cells[p]".format("256 - " if loop.step == 1 else ""))
+            if pointer_policy == 'clamp' and loop.max_offset > 0:
+                lines.append(inner + "if p + {0} >= tape_length: tape_length = grow_tape(cells, p + {0})".format(
+                    loop.max_offset))
+            for offset, delta in loop.changes:
+                lines.append(inner + "cells[p + {0}] = (cells[p + {0}] + {1} * count) & 255".format(offset, delta))
+            lines.append(inner + "cells[p] = 0")
+            lines.append(inner + "steps += count * {}".format(weights[op_index] + 1))
+            lines.append(inner + "if steps > step_limit: raise timeout_error(steps)")
+            if len(conditions) > 1:
+                # Otherwise, run the body like a plain loop, letting the moves apply the pointer policy
+                lines.append(indent + "else:")
+                _emit_loop(lines, inner, program, op_index + 1, loop.close, pointer_policy, scored, timed)
+            op_index = loop.close
+        op_index += 1
+    return pending
+
+
+def generate_source(program, pointer_policy='clamp', scored=False, timed=False):
+    """
+    Write the Python source of a function that runs a program
+    :param program: A CompiledProgram
+    :param pointer_policy: As in interpret.execute; the pointer checks are written into the source
+    :param scored: Whether the function scores its output against a target as it is printed
+    :param timed: Whether the function checks a wall-clock deadline rather than a step budget in loops
+    :return: The source, defining a function run
+    """
+    lines = [_FUNCTION_HEADER,
+             "    p = i = steps = mismatch = 0",
+             "    output = bytearray()",
+             "    append = output.append"]
+    pending = _emit_ops(lines, "    ", program, 0, len(program.ops), pointer_policy, scored, timed)
+    if pending:
+        lines.append("    steps += {}".format(pending))
+    lines.append("    return output, steps, mismatch, True")
+    return "\n".join(lines) + "\n"
+
+
+def generate_program(code, pointer_policy='clamp', scored=False, timed=False):
+    """
+    Generate and compile the function for a program, or fetch it from code_cache
+    :param code: The BF program
+    :param pointer_policy: As in interpret.execute
+    :param scored: Whether it will be run with a target
+    :param timed: Whether it will be run with an 'ms' timeout
+    :return: A GeneratedProgram
+    """
+    key = (code, pointer_policy, scored, timed)
+    generated = code_cache.lookup(key)
+    if generated is not None:
+        return generated
+    compiled = interpret.compile_program(code)
+    namespace = {'grow_tape': interpret.grow_tape, 'bounds_error': _bounds_error, 'time': time.time}
+    try:
+        exec(compile(generate_source(compiled, pointer_policy, scored, timed), "<bf>", "exec"), namespace)
+        function = namespace['run']
+    except (SyntaxError, RecursionError, MemoryError):
+        # Too deeply nested for Python's compiler
+        function = None
+    generated = GeneratedProgram(code=compiled.code, function=function, compiled=compiled)
+    code_cache.store(key, generated)
+    return generated
+
+
+def execute(program, input_string, timeout=5, return_time=False, timeout_unit='ms', target=None, output_slack=None,
+            mismatch_bound=None, tape_size=interpret.TAPE_SIZE, pointer_policy='clamp'):
+    """
+    Run a GeneratedProgram; takes the same arguments and gives the same results as interpret.execute
+    :param program: A GeneratedProgram from generate_program, made for the same pointer_policy, with scored set if
+            target is given and timed set if timeout_unit is 'ms'
+    """
+    if program.function is None:
+        return interpret.execute(program.compiled, input_string, timeout, return_time, timeout_unit, target,
+                                 output_slack, mismatch_bound, tape_size, pointer_policy)
+    if timeout_unit not in interpret.TIMEOUT_UNITS:
+        raise ValueError("timeout_unit must be one of {}, not {!r}.".format(interpret.TIMEOUT_UNITS, timeout_unit))
+    if pointer_policy not in interpret.POINTER_POLICIES:
+        raise ValueError("pointer_policy must be one of {}, not {!r}.".format(interpret.POINTER_POLICIES,
+                                                                             pointer_policy))
+    if tape_size < 1:
+        raise ValueError("tape_size must be at least 1, not {!r}.".format(tape_size))
+    input_codes, bytes_mode = interpret.prepare_input(input_string)
+    target_codes, target_length, output_limit = None, 0, float('inf')
+    if target is not None:
+        target_codes = interpret.char_codes(target)
+        target_length = len(target_codes)
+        if output_slack is not None:
+            output_limit = target_length + output_slack
+        if mismatch_bound is None:
+            mismatch_bound = float('inf')
+
+    time_begin = time.time()
+    if timeout_unit == 'ms':
+        time_target = time_begin + (timeout / 1000)
+        step_limit = float('inf')
+    else:
+        time_target = None
+        step_limit = timeout
+    output, steps, mismatch, complete = program.function(bytearray(tape_size), tape_size, input_codes,
+                                                         len(input_codes) - 1, step_limit, time_target, target_codes,
+                                                         target_length, mismatch_bound, output_limit,
+                                                         partial(interpret.timeout_exception, timeout, timeout_unit))
+    if steps > step_limit:
+        # Loop-free code, and runs stopped early, can also be over the budget
+        raise interpret.timeout_exception(timeout, timeout_unit, steps)
+
+    output = bytes(output) if bytes_mode else output.decode('latin-1')
+    elapsed = time.time() - time_begin if timeout_unit == 'ms' else steps
+    if target is not None:
+        return interpret.ScoredRun(output, elapsed, mismatch, complete, steps)
+    if return_time:
+        return (output, elapsed)
+    return output
+
+
+def evaluate(code, input_string, timeout=5, return_time=False, timeout_unit='ms', target=None, output_slack=None,
+             mismatch_bound=None, tape_size=interpret.TAPE_SIZE, pointer_policy='clamp'):
+    """
+    interpret.evaluate, run through a generated function
+    :param code: The BF program, or a GeneratedProgram
+    """
+    if not isinstance(code, GeneratedProgram):
+        code = generate_program(code, pointer_policy, target is not None, timeout_unit == 'ms')
+    return execute(code, input_string, timeout, return_time, timeout_unit, target, output_slack, mismatch_bound,
+                   tape_size, pointer_policy)
@@ -3,3 +3,33 @@ valid_commands = ['.', ',', '[', ']', '<', '>', '+', '-']  # These are the valid
 valid_commands_no_end_loop = ['.', ',', '[', '<', '>', '+', '-']
 valid_commands_no_loops = ['.', ',', '<', '>', '+', '-']
 valid_commands_no_loops_weighted = ['.', ',', '<', '>'] + (['+'] * 10) + (['-'] * 10)
+
+
+def bracket_depths(program):
+    """
+    Find the loop depth at each cut point of a program
+    :param program: A BF program
+    :return: A list of len(program) + 1 depths; depths[i] is how many loops are open before program[i]
+    """
+    depths = [0]
+    for command in program:
+        depths.append(depths[-1] + (command == '[') - (command == ']'))
+    return depths
+
+
+def matching_brackets(program):
+    """
+    Pair up the brackets of a program
+    :param program: A BF program
+    :return: A dict mapping the index of each bracket to the index of its partner; unmatched brackets are left out
+    """
+    matches = {}
+    open_stack = []
+    for index, command in enumerate(program):
+        if command == '[':
+            open_stack.append(index)
+        elif command == ']' and open_stack:
+            open_index = open_stack.pop()
+            matches[open_index] = index
+            matches[index] = open_index
+    return matches
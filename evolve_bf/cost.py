@@ -1,10 +1,32 @@
-from collections import namedtuple
-from evolve_bf import interpret
+from collections import namedtuple, Counter
+from evolve_bf import interpret, batch, analysis, codegen
+import operator
 import string
+
+try:
+    import numpy
+except ImportError:  # NumPy only speeds up scoring long outputs
+    numpy = None
+
 ascii_list = string.ascii_letters+string.digits
 
 MAX_CODEPOINT = 1114111  # The maximum Unicode codepoint
 
+NUMPY_SCORING_THRESHOLD = 256  # Outputs and targets with at least this many chars between them are scored with NumPy
+
+OVER_BOUND = float('inf')  # Returned instead of a cost when costing was abandoned for going over the caller's bound
+
+# The counts cost_function and cost_function_batch add to a stats Counter:
+#   syntax_errors: programs with unbalanced brackets
+#   timeouts: programs that ran out of time on some input
+#   tape_errors: programs that broke the 'error' pointer_policy
+#   steps: BF symbols executed, over every input run
+STATS_KEYS = ('syntax_errors', 'timeouts', 'tape_errors', 'steps')
+# The STATS_KEYS that count inviable programs; each inviable program adds 1 to exactly one of them
+INVIABLE_CAUSES = ('syntax_errors', 'timeouts', 'tape_errors')
+
+INTERPRETERS = ('dispatch', 'codegen')
+
 # What each failure costs
 default_cost_table = {'timeout': 1,
                       'no output': 25,
@@ -19,15 +41,78 @@ default_cost_table = {'timeout': 1,
                       'not_equal': 1}
 
 # Options for the cost_function:
-#   program_timeout: The maximum time each BF program is allowed, in ms
+#   program_timeout: The maximum time each BF program is allowed, in timeout_unit
 #   cost_table: a dict containing the values required for costing, one int per key
+#   time_cost: True means that run time is added to the cost of incorrect programs (ms, or steps executed)
 #   ascii_only: True means that non-alphanumeric-ASCII output characters add to the cost
-CostOptions = namedtuple("CostOptions", ['program_timeout', 'cost_table', 'time_cost', 'ascii_only'])
+#   timeout_unit: 'ms' for a wall-clock timeout, or 'steps' for a reproducible budget of executed BF symbols
+#   tape_size: How many cells each program's tape starts with; see interpret.TAPE_SIZE
+#   pointer_policy: What happens when the cell pointer leaves the tape; see interpret.POINTER_POLICIES. Programs that
+#       break the 'error' policy are inviable.
+#   output_slack: If not None, stop a program once its output is this many chars longer than the target. The chars past
+#       that point are not run, so they add nothing to the cost; None runs every program to the end.
+#   interpreter: 'dispatch' runs programs on interpret.execute; 'codegen' runs each as a generated Python function (see
+#       codegen), which is faster for programs that run for long or are costed again and again. Costs are the same.
+#   length_cost: Added to the cost of incorrect programs for each symbol in them, so that of two programs that are
+#       equally wrong, the shorter wins; 0 puts no pressure on length
+CostOptions = namedtuple("CostOptions", ['program_timeout', 'cost_table', 'time_cost', 'ascii_only', 'timeout_unit',
+                                         'output_slack', 'tape_size', 'pointer_policy', 'interpreter', 'length_cost'],
+                         defaults=['ms', None, interpret.TAPE_SIZE, 'clamp', 'dispatch', 0])
 
 default_cost_options = CostOptions(program_timeout=10,
                                    cost_table=default_cost_table,
                                    time_cost = False,
-                                   ascii_only=True)
+                                   ascii_only=True,
+                                   timeout_unit='ms',
+                                   output_slack=None,
+                                   tape_size=interpret.TAPE_SIZE,
+                                   pointer_policy='clamp',
+                                   interpreter='dispatch',
+                                   length_cost=0)
+
+# A problem prepared once for costing many programs against it; see prepare_suite:
+#   inputs, targets: as given
+#   prepared_inputs, prepared_targets: an interpret.PreparedText for each, so that runs do not convert them again
+#   target_lengths: the length of each target
+#   cost_table: the cost table the penalties below were taken from
+#   not_equal, wrong_char: those entries of cost_table
+#   missing_char: the cost of each char missing from the end of an output
+#   empty_cost: the total cost of printing nothing on every input
+TestSuite = namedtuple("TestSuite", ['inputs', 'targets', 'prepared_inputs', 'prepared_targets', 'target_lengths',
+                                     'cost_table', 'not_equal', 'wrong_char', 'missing_char', 'empty_cost'])
+
+
+def prepare_suite(inputs, targets, options=default_cost_options):
+    """
+    Work out everything about the inputs and targets that costing a program needs, once for a whole evolution
+    :param inputs: As for cost_function
+    :param targets: As for cost_function
+    :param options: A CostOptions namedtuple; only cost_table is used
+    :return: A TestSuite
+    """
+    return TestSuite(inputs=inputs, targets=targets,
+                     prepared_inputs=[interpret.prepare_input(input_string) for input_string in inputs],
+                     prepared_targets=[interpret.prepare_target(target) for target in targets],
+                     target_lengths=[len(target) for target in targets],
+                     cost_table=options.cost_table,
+                     not_equal=options.cost_table['not_equal'], wrong_char=options.cost_table['wrong_char'],
+                     missing_char=options.cost_table['wrong_char'] * MAX_CODEPOINT,
+                     empty_cost=sum(score_output(target[:0], target, options) for target in targets))
+
+
+def get_suite(inputs, targets, options=default_cost_options, suite=None):
+    """
+    Reuse a TestSuite if it was prepared with the same cost_table, or prepare a new one
+    :param inputs: As for cost_function
+    :param targets: As for cost_function
+    :param options: A CostOptions namedtuple
+    :param suite: A TestSuite prepared earlier, or None
+    :return: A TestSuite
+    """
+    if suite is not None and (suite.cost_table is options.cost_table or suite.cost_table == options.cost_table):
+        return suite
+    return prepare_suite(inputs, targets, options)
+
 
 def set_intersection(a, b):
     c = []
@@ -37,78 +122,407 @@ def set_intersection(a, b):
     return c
 
 
-def cost_function(inputs, targets, program, options=default_cost_options):
+def byte_mismatch(output, target):
+    """
+    Compare a bytes output against a bytes target without creating any chars
+    :param output: What the program printed, as bytes
+    :param target: What it should have printed, as bytes
+    :return: The mismatch, as in interpret.ScoredRun
+    """
+    return _code_mismatch(memoryview(output), memoryview(target))
+
+
+def _code_mismatch(output_codes, target_codes):
+    compared = min(len(output_codes), len(target_codes))
+    return (sum(map(abs, map(operator.sub, output_codes[:compared], target_codes[:compared]))) +
+            sum(output_codes[compared:]))
+
+
+def _text_codes(texts, bytes_mode):
+    """
+    :return: The chars of every text, one after another, as a NumPy array of codes
+    """
+    if bytes_mode:
+        return numpy.frombuffer(b"".join(texts), dtype=numpy.uint8).astype(numpy.int64)
+    return numpy.frombuffer("".join(texts).encode('utf-32-le'), dtype=numpy.uint32).astype(numpy.int64)
+
+
+def output_mismatches(outputs, target):
+    """
+    Compare many outputs against one target at once; the same mismatches as byte_mismatch, or as interpret.ScoredRun
+    :param outputs: A list of outputs, all strs or all bytes
+    :param target: The expected output, of the same type
+    :return: A list of mismatches, as ints, in the same order as outputs: for each output, the sum of abs(ord(expected)
+            - ord(actual)) over the chars it shares with target, plus the sum of ord(char) over any chars past the end
+            of target
+    """
+    bytes_mode = isinstance(target, interpret.BYTES_TYPES)
+    if numpy is None:
+        if bytes_mode:
+            return [byte_mismatch(output, target) for output in outputs]
+        target_codes = [ord(char) for char in target]
+        return [_code_mismatch([ord(char) for char in output], target_codes) for output in outputs]
+    target_codes = _text_codes([target], bytes_mode)
+    codes = _text_codes(outputs, bytes_mode)
+    lengths = numpy.fromiter(map(len, outputs), dtype=numpy.int64, count=len(outputs))
+    ends = numpy.cumsum(lengths)
+    starts = ends - lengths
+    # Each char's position within its own output, found without a Python loop over the chars
+    positions = numpy.arange(len(codes), dtype=numpy.int64) - numpy.repeat(starts, lengths)
+    shared = positions < len(target_codes)
+    differences = codes.copy()  # Chars past the end of the target count in full
+    differences[shared] = numpy.abs(codes[shared] - target_codes[positions[shared]])
+    # Sums over each output, as differences of a running total, so that empty outputs sum to 0
+    totals = numpy.concatenate(([0], numpy.cumsum(differences)))
+    return (totals[ends] - totals[starts]).tolist()
+
+
+def score_outputs(outputs, target, options=default_cost_options):
+    """
+    Cost many outputs against one target; the same costs as score_output on each, with the chars compared by NumPy
+    :param outputs: A list of outputs, all strs or all bytes
+    :param target: What each should have printed, of the same type
+    :param options: A CostOptions namedtuple; only cost_table is used
+    :return: A list of ints, in the same order as outputs
+    """
+    if numpy is None or sum(map(len, outputs)) + len(target) < NUMPY_SCORING_THRESHOLD:
+        return [score_output(output, target, options) for output in outputs]
+    return [score_streamed_output(output, target, mismatch, options)
+            for output, mismatch in zip(outputs, output_mismatches(outputs, target))]
+
+
+def score_output(output, target, options=default_cost_options):
+    """
+    Cost a program's output for one input against the expected output
+    :param output: What the program printed
+    :param target: What it should have printed; if both are bytes, they are compared as bytes (see
+            interpret.BYTES_TYPES)
+    :param options: A CostOptions namedtuple; only cost_table is used
+    :return: int, 0 if the output is correct
+    """
+    if isinstance(output, interpret.BYTES_TYPES):
+        if output == target:
+            return 0
+        return score_streamed_output(output, target, byte_mismatch(output, target), options)
+    if numpy is not None and len(output) + len(target) >= NUMPY_SCORING_THRESHOLD:
+        if output == target:
+            return 0
+        return score_streamed_output(output, target, output_mismatches([output], target)[0], options)
+
+    program_cost_addition = 0
+    if output == target:
+        # Program output is CORRECT for this input
+        return 0  # Ding ding ding we have a winner
+    else:
+        # This is here to ensure that incorrect programs cannot win unless someone changes the value :(
+        program_cost_addition += options.cost_table['not_equal']
+
+    # Now, apply the simple cost value.
+    if len(output) == 0:
+        # No output - penalize at maximum for all expected chars
+        program_cost_addition += options.cost_table['wrong_char'] * MAX_CODEPOINT * len(target)
+    elif len(output) < len(target):
+        # Missing some chars. Penalize for the difference between existing chars and target, then
+        #    for missing chars.
+        for char_index in range(0, len(output)):
+            # output is shorter, so this is safe
+            expected_char = target[char_index]
+            actual_char = output[char_index]
+            program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
+        program_cost_addition += options.cost_table['wrong_char'] * MAX_CODEPOINT * \
+                abs(len(output) - len(target))
+    elif len(target) < len(output):
+        # Too many chars; penalize for the difference between existing chars and target, then
+        #   for missing chars.
+        for char_index in range(0, len(target)):
+            # target is shorter, so this is safe
+            expected_char = target[char_index]
+            actual_char = output[char_index]
+            program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
+        for char in output[len(target):]:
+            program_cost_addition += options.cost_table['wrong_char'] * ord(char)
+    else:
+        # They are of equal lengths; just compare them.
+        for char_index in range(0, len(target)):
+            # target is as long as output, so this is safe
+            expected_char = target[char_index]
+            actual_char = output[char_index]
+            program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
+    return program_cost_addition
+
+
+def score_streamed_output(output, target, mismatch, options=default_cost_options):
+    """
+    Cost an output the interpreter has already compared against the target; gives the same cost as score_output
+    :param output: What the program printed
+    :param target: What it should have printed
+    :param mismatch: The ScoredRun mismatch from interpret.evaluate
+    :param options: A CostOptions namedtuple; only cost_table is used
+    :return: int, 0 if the output is correct
+    """
+    if mismatch == 0 and len(output) == len(target):
+        return 0
+    program_cost_addition = options.cost_table['not_equal'] + options.cost_table['wrong_char'] * mismatch
+    if len(output) < len(target):
+        # Penalize at maximum for each missing char
+        program_cost_addition += options.cost_table['wrong_char'] * MAX_CODEPOINT * (len(target) - len(output))
+    return program_cost_addition
+
+
+def score_prepared_output(suite, target_index, output_length, mismatch):
+    """
+    score_streamed_output, with the target and penalties taken from a TestSuite
+    :param suite: A TestSuite
+    :param target_index: Which of the suite's targets the output is for
+    :param output_length: How long the output is
+    :param mismatch: The ScoredRun mismatch from interpret.evaluate
+    :return: int, 0 if the output is correct
+    """
+    target_length = suite.target_lengths[target_index]
+    if mismatch == 0 and output_length == target_length:
+        return 0
+    program_cost_addition = suite.not_equal + suite.wrong_char * mismatch
+    if output_length < target_length:
+        program_cost_addition += suite.missing_char * (target_length - output_length)
+    return program_cost_addition
+
+
+def get_mismatch_bound(bound, program_cost, options=default_cost_options):
+    """
+    Find how much mismatch a program may print before its cost is sure to go over bound
+    :param bound: The caller's bound, or None
+    :param program_cost: The cost so far, from the inputs already run
+    :param options: A CostOptions namedtuple; only cost_table is used
+    :return: The mismatch bound for interpret.evaluate, or None if there is no bound
+    """
+    if bound is None or options.cost_table['wrong_char'] <= 0:
+        return None
+    # Any mismatch past this makes the cost for this input alone push the total over the bound. It is kept at least 0
+    #   so that a correct output, which costs nothing, is never stopped.
+    return max(0, (bound - program_cost - options.cost_table['not_equal']) // options.cost_table['wrong_char'])
+
+
+def predict_cost(inputs, targets, program, options=default_cost_options, bound=None, stats=None, suite=None):
+    """
+    Cost a program without running it, where analysis.analyze_program shows what running it would give
+    :param inputs: As for cost_function
+    :param targets: As for cost_function
+    :param program: As for cost_function
+    :param options: As for cost_function
+    :param bound: As for cost_function
+    :param stats: As for cost_function; predicted timeouts count as using the whole budget
+    :param suite: As for cost_function
+    :return: What cost_function would return, or None if the program has to be run to find out
+    """
+    program_analysis = analysis.analyze_program(program, options.pointer_policy, options.tape_size)
+    if not program_analysis.balanced:
+        # Program was not valid - mismatched brackets
+        if stats is not None:
+            stats['syntax_errors'] += 1
+        return False
+    if (program_analysis.never_halts is not None and options.output_slack is None and
+            (bound is None or '.' not in program[:program_analysis.never_halts])):
+        # It would run until it timed out on the first input. (With output_slack it could be stopped for printing too
+        #   much first, and with a bound for printing too many wrong chars before it reaches the loop, so then it is
+        #   run.)
+        if stats is not None:
+            stats['timeouts'] += 1
+            if options.timeout_unit == 'steps':
+                stats['steps'] += options.program_timeout
+        return False
+    if (not program_analysis.has_output and program_analysis.loop_free and not options.time_cost and
+            options.pointer_policy != 'error' and
+            (options.timeout_unit == 'ms' or len(program) <= options.program_timeout)):
+        # It prints nothing, and always halts in time, so its cost only depends on the targets
+        if suite is not None:
+            program_cost = suite.empty_cost
+        else:
+            program_cost = sum(score_output(target[:0], target, options) for target in targets)
+        if program_cost > 0:
+            program_cost += options.length_cost * len(program)
+        if bound is not None and program_cost > bound:
+            return OVER_BOUND
+        return program_cost
+    return None
+
+
+def cost_function(inputs, targets, program, options=default_cost_options, bound=None, stats=None, suite=None):
     """
     Check whether a given program, when passed inputs, produces the corresponding outputs
-    :param inputs: Inputs to pass
-    :param targets: Expected targets
+    :param inputs: Inputs to pass; either all strs, or all bytes for bytes mode (see interpret.BYTES_TYPES)
+    :param targets: Expected targets, of the same type as inputs
     :param options: A CostOptions namedtuple containing all options for cost function execution
+    :param bound: If given, stop as soon as the cost is known to be above this and return OVER_BOUND
+    :param stats: If given, a collections.Counter to add to; see STATS_KEYS
+    :param suite: A TestSuite from prepare_suite(inputs, targets, options), to share between every program costed
+            against the same inputs and targets; prepared here if None
     :return: int
     """
     program_cost = 0
-    program_cost_addition = 0
     time_cost = 0
+    suite = get_suite(inputs, targets, options, suite)
+    predicted_cost = predict_cost(inputs, targets, program, options, bound, stats, suite)
+    if predicted_cost is not None:
+        return predicted_cost
+    # Compile once; every input runs the same op list
+    if options.interpreter == 'codegen':
+        compiled_program = codegen.generate_program(program, options.pointer_policy, scored=True,
+                                                    timed=options.timeout_unit == 'ms')
+        run = codegen.execute
+    elif options.interpreter == 'dispatch':
+        compiled_program = interpret.compile_program(program)
+        run = interpret.execute
+    else:
+        raise ValueError("interpreter must be one of {}, not {!r}.".format(INTERPRETERS, options.interpreter))
     for input_string_index in range(0, len(inputs)):
-        program_cost_addition = 0
-        # Run the program, ensuring that it is not an infinite loop or a syntax error, then applying costs to it
+        mismatch_bound = get_mismatch_bound(bound, program_cost, options)
+        # Run the program, ensuring that it is not an infinite loop, then applying costs to it. The output is scored as
+        #   it is printed, so a hopeless or runaway program can be stopped early.
         try:
-            (output, runtime) = interpret.evaluate(program, inputs[input_string_index], options.program_timeout, return_time=True)
-        except (interpret.BFSyntaxException, KeyError, interpret.TimeoutAbortException):
-            # Program was not valid - mismatched brackets
+            scored_run = run(compiled_program, suite.prepared_inputs[input_string_index], options.program_timeout,
+                             timeout_unit=options.timeout_unit, target=suite.prepared_targets[input_string_index],
+                             output_slack=options.output_slack, mismatch_bound=mismatch_bound,
+                             tape_size=options.tape_size, pointer_policy=options.pointer_policy)
+        except interpret.TimeoutAbortException as exception:
+            if stats is not None:
+                stats['timeouts'] += 1
+                # A run over a step budget is counted as using the budget, which is the same whichever interpreter
+                #   noticed it
+                stats['steps'] += options.program_timeout if options.timeout_unit == 'steps' else exception.steps
+            return False
+        except interpret.TapeBoundsException:
+            if stats is not None:
+                stats['tape_errors'] += 1
             return False
+        output, runtime = scored_run.output, scored_run.elapsed
+        if stats is not None:
+            stats['steps'] += scored_run.steps
+        if mismatch_bound is not None and scored_run.mismatch > mismatch_bound:
+            return OVER_BOUND
         if options.time_cost:
-            time_cost += int(runtime * 1000)  # This will only be added to the cost if the program is not correct, i.e., the cost is not zero at the end.
+            # This will only be added to the cost if the program is not correct, i.e., the cost is not zero at the end.
+            if options.timeout_unit == 'steps':
+                time_cost += runtime
+            else:
+                time_cost += int(runtime * 1000)
         else:
             time_cost = 0
 
-        if output == targets[input_string_index]:
-            # Program output is CORRECT for this input
-            program_cost_addition = 0  # Ding ding ding we have a winner
-            program_cost += program_cost_addition
-            continue
-        else:
-            # This is here to ensure that incorrect programs cannot win unless someone changes the value :(
-            program_cost_addition += options.cost_table['not_equal']
-
-        # Now, apply the simple cost value.
-        if len(output) == 0:
-            # No output - penalize at maximum for all expected chars
-            program_cost_addition += options.cost_table['wrong_char'] * MAX_CODEPOINT * len(targets[input_string_index])
-        elif len(output) < len(targets[input_string_index]):
-            # Missing some chars. Penalize for the difference between existing chars and target, then
-            #    for missing chars.
-            for char_index in range(0, len(output)):
-                # output is shorter, so this is safe
-                expected_char = targets[input_string_index][char_index]
-                actual_char = output[char_index]
-                program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
-            program_cost_addition += options.cost_table['wrong_char'] * MAX_CODEPOINT * \
-                    abs(len(output) - len(targets[input_string_index]))
-        elif len(targets[input_string_index]) < len(output):
-            # Too many chars; penalize for the difference between existing chars and target, then
-            #   for missing chars.
-            for char_index in range(0, len(targets[input_string_index])):
-                # target is shorter, so this is safe
-                expected_char = targets[input_string_index][char_index]
-                actual_char = output[char_index]
-                program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
-            for char in output[len(targets[input_string_index]):]:
-                program_cost_addition += options.cost_table['wrong_char'] * ord(char)
-        else:
-            # They are of equal lengths; just compare them.
-            for char_index in range(0, len(targets[input_string_index])):
-                # target is as long as output, so this is safe
-                expected_char = targets[input_string_index][char_index]
-                actual_char = output[char_index]
-                program_cost_addition += options.cost_table['wrong_char'] * abs(ord(expected_char) - ord(actual_char))
-        program_cost += program_cost_addition 
+        program_cost += score_prepared_output(suite, input_string_index, len(output), scored_run.mismatch)
+        if bound is not None and program_cost > bound:
+            # Time cost only ever adds to this, so the remaining inputs cannot bring it back under the bound
+            return OVER_BOUND
 
     if program_cost > 0:
-        program_cost += time_cost
+        program_cost += time_cost + options.length_cost * len(program)
         return program_cost
     else:
         return 0
 
+
+def get_inviable_cause(program_stats):
+    """
+    :param program_stats: A stats Counter that only one program was costed into
+    :return: The INVIABLE_CAUSES key the program counted towards, or None if it was viable
+    """
+    for cause in INVIABLE_CAUSES:
+        if program_stats[cause]:
+            return cause
+    return None
+
+
+def cost_function_batch(inputs, targets, programs, options=default_cost_options, bound=None, stats=None, suite=None,
+                        causes=None):
+    """
+    Cost many programs at once with the lockstep batch interpreter; gives the same costs as cost_function
+    :param inputs: Inputs to pass; strs, or bytes for bytes mode
+    :param targets: Expected targets, of the same type as inputs
+    :param programs: A list of programs to cost
+    :param options: A CostOptions namedtuple; timeout_unit must be 'steps' and pointer_policy 'clamp'
+    :param bound: If given, programs are dropped as soon as their cost is known to be above this, costing OVER_BOUND
+    :param stats: If given, a collections.Counter to add to, as with cost_function
+    :param suite: A TestSuite, as with cost_function
+    :param causes: If given, a list to extend with why each program was inviable: one of INVIABLE_CAUSES, or None
+    :return: A list of costs, in the same order as programs, with False for inviable programs
+    """
+    if options.timeout_unit != 'steps':
+        raise ValueError("Batch costing needs a step budget; set timeout_unit='steps' in the CostOptions.")
+    if options.pointer_policy != 'clamp':
+        raise ValueError("Batch costing only supports the 'clamp' pointer_policy.")
+    program_costs = [False] * len(programs)
+    program_causes = [None] * len(programs)
+    time_costs = [0] * len(programs)
+    compiled_programs = []
+    viable = []  # Indices into programs of those still viable
+    suite = get_suite(inputs, targets, options, suite)
+    for program_index, program in enumerate(programs):
+        if causes is None:
+            predicted_cost = predict_cost(inputs, targets, program, options, bound, stats, suite)
+        else:
+            program_stats = Counter()
+            predicted_cost = predict_cost(inputs, targets, program, options, bound, program_stats, suite)
+            program_causes[program_index] = get_inviable_cause(program_stats)
+            if stats is not None:
+                stats.update(program_stats)
+        if predicted_cost is not None:
+            program_costs[program_index] = predicted_cost
+            continue
+        compiled_programs.append(interpret.compile_program(program))
+        viable.append(program_index)
+        program_costs[program_index] = 0
+    if not viable:
+        if causes is not None:
+            causes.extend(program_causes)
+        return program_costs
+
+    packed_programs = batch.pack_programs(compiled_programs)
+    for input_string_index in range(0, len(inputs)):
+        mismatch_bounds = None
+        if bound is not None:
+            # Stopped programs keep the output printed so far, which already scores over the bound
+            mismatch_bounds = [get_mismatch_bound(bound, program_costs[program_index], options)
+                               for program_index in viable]
+        outputs, runtimes = batch.run_batch(packed_programs, suite.prepared_inputs[input_string_index],
+                                            options.program_timeout, return_time=True, programs=compiled_programs,
+                                            target=suite.prepared_targets[input_string_index],
+                                            output_slack=options.output_slack, mismatch_bounds=mismatch_bounds)
+        still_viable = []
+        # Every output that finished is scored against the target in one go
+        finished_rows = [row for row in range(len(viable)) if outputs[row] is not None]
+        scores = dict(zip(finished_rows, score_outputs([outputs[row] for row in finished_rows],
+                                                       targets[input_string_index], options)))
+        if stats is not None:
+            # As in cost_function, timeouts count as using the whole budget
+            stats['steps'] += sum(runtime if output is not None else options.program_timeout
+                                  for output, runtime in zip(outputs, runtimes))
+            stats['timeouts'] += outputs.count(None)
+        for row, program_index in enumerate(viable):
+            if outputs[row] is None:
+                # Timed out, so inviable; it is not run on the remaining inputs
+                program_costs[program_index] = False
+                program_causes[program_index] = 'timeouts'
+                continue
+            still_viable.append(row)
+            if options.time_cost:
+                time_costs[program_index] += runtimes[row]
+            program_costs[program_index] += scores[row]
+            if bound is not None and program_costs[program_index] > bound:
+                program_costs[program_index] = OVER_BOUND
+                still_viable.pop()
+        if len(still_viable) < len(viable):
+            packed_programs = batch.subset(packed_programs, still_viable)
+            compiled_programs = [compiled_programs[row] for row in still_viable]
+            viable = [viable[row] for row in still_viable]
+
+    for program_index in viable:
+        if program_costs[program_index] > 0:
+            program_costs[program_index] += (time_costs[program_index] +
+                                             options.length_cost * len(programs[program_index]))
+    if causes is not None:
+        causes.extend(program_causes)
+    return program_costs
+
+
 def old_cost_function(inputs, targets, program, options=default_cost_options):
     """
     Check whether a given program, when passed inputs, produces the corresponding outputs
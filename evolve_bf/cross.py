@@ -1,20 +1,52 @@
-from random import randint
+from random import randint, choice
+from evolve_bf import common
+
+SUBTREE_SWAP_CHANCE = 20  # Percent of crosses between two programs with loops that swap a whole loop instead of tails
+
 
 def crossing_function(program_a, program_b):
     """
-    Cross program_a and program_b, producing program_ab and program_ab'
+    Cross program_a and program_b, producing program_ab and program_ab'. Cuts are only made where both programs have the
+    same number of loops open, so balanced parents always give balanced children.
     :param program_a: Program A for the cross
     :param program_b: Program B for the cross
     :return:
     """
-    # TODO: Implement something other than naive randomness here
     if len(program_a) == 1 or len(program_b) == 1:
         return program_a + program_b, program_b + program_a
 
-    if len(program_a) > len(program_b):
-        crossing_index = randint(0, len(program_b))
-    else:
-        crossing_index = randint(0, len(program_a))
-    program_aprime = program_a[:crossing_index] + program_b[crossing_index:]
-    program_bprime = program_b[:crossing_index] + program_a[crossing_index:]
+    loops_a = [index for index, command in enumerate(program_a) if command == '[']
+    loops_b = [index for index, command in enumerate(program_b) if command == '[']
+    if loops_a and loops_b and randint(1, 100) <= SUBTREE_SWAP_CHANCE:
+        return swap_loops(program_a, program_b, choice(loops_a), choice(loops_b))
+
+    depths_a = common.bracket_depths(program_a)
+    depths_b = common.bracket_depths(program_b)
+    crossing_index = randint(0, min(len(program_a), len(program_b)))
+    # Cut B at the point nearest the cut in A that has the same depth; the ends of a program are always at depth 0
+    depth = depths_a[crossing_index]
+    crossing_index_b = min((index for index, index_depth in enumerate(depths_b) if index_depth == depth),
+                           key=lambda index: abs(index - crossing_index), default=None)
+    if crossing_index_b is None:
+        crossing_index = crossing_index_b = 0
+    program_aprime = program_a[:crossing_index] + program_b[crossing_index_b:]
+    program_bprime = program_b[:crossing_index_b] + program_a[crossing_index:]
     return program_aprime, program_bprime
+
+
+def swap_loops(program_a, program_b, open_a, open_b):
+    """
+    Swap a loop of program_a with a loop of program_b
+    :param program_a: Program A
+    :param program_b: Program B
+    :param open_a: The index of the [ of the loop to take from A
+    :param open_b: The index of the [ of the loop to take from B
+    :return: A tuple of A with B's loop in place of its own, and B with A's loop
+    """
+    close_a = common.matching_brackets(program_a).get(open_a)
+    close_b = common.matching_brackets(program_b).get(open_b)
+    if close_a is None or close_b is None:
+        # Unbalanced parents have no whole loop to swap
+        return program_a, program_b
+    loop_a, loop_b = program_a[open_a:close_a + 1], program_b[open_b:close_b + 1]
+    return program_a[:open_a] + loop_b + program_a[close_a + 1:], program_b[:open_b] + loop_a + program_b[close_b + 1:]
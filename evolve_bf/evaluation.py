@@ -0,0 +1,228 @@
+# Population evaluation backends for evolve_bf.
+# An evaluator scores a whole population at once and returns the costs in population order, so the evolution loop
+#   behaves the same whichever backend does the work.
+
+import multiprocessing
+from collections import Counter
+from evolve_bf import cost, cache, batch
+
+EVALUATION_BACKENDS = ('serial', 'process', 'numpy')
+
+# Set once per worker process by _init_worker, so that inputs and targets are not re-sent with every task
+_worker_inputs = None
+_worker_targets = None
+_worker_suite = None
+
+
+def _init_worker(inputs, targets, suite=None):
+    global _worker_inputs, _worker_targets, _worker_suite
+    _worker_inputs = inputs
+    _worker_targets = targets
+    _worker_suite = suite
+
+
+def _cost_programs(inputs, targets, programs, cost_options, bound, stats, suite, causes):
+    if causes is None:
+        return [cost.cost_function(inputs, targets, program, options=cost_options, bound=bound, stats=stats,
+                                   suite=suite)
+                for program in programs]
+    program_costs = []
+    for program in programs:
+        # Each program gets its own Counter, so that its cause can be told apart
+        program_stats = Counter()
+        program_costs.append(cost.cost_function(inputs, targets, program, options=cost_options, bound=bound,
+                                                stats=program_stats, suite=suite))
+        causes.append(cost.get_inviable_cause(program_stats))
+        if stats is not None:
+            stats.update(program_stats)
+    return program_costs
+
+
+def _cost_chunk(task):
+    global _worker_suite
+    cost_options, bound, programs, want_causes = task
+    stats = Counter()
+    causes = [] if want_causes else None
+    # Checked once a chunk, as the cost options arrive unpickled with every task
+    _worker_suite = cost.get_suite(_worker_inputs, _worker_targets, cost_options, _worker_suite)
+    return (_cost_programs(_worker_inputs, _worker_targets, programs, cost_options, bound, stats, _worker_suite, causes),
+            stats, causes)
+
+
+class SerialEvaluator(object):
+    """
+    Score programs one after another in this process
+    """
+    def __init__(self, inputs, targets, suite=None):
+        """
+        :param inputs: Inputs to pass to each program
+        :param targets: Expected outputs
+        :param suite: A cost.TestSuite prepared from inputs and targets, or None to prepare one when first needed
+        """
+        self.inputs = inputs
+        self.targets = targets
+        self.suite = suite
+
+    def costs(self, programs, cost_options, bound=None, stats=None, causes=None):
+        """
+        Score every program
+        :param programs: A list of BF programs
+        :param cost_options: A CostOptions for cost.cost_function
+        :param bound: If given, programs known to cost more than this are abandoned and cost cost.OVER_BOUND
+        :param stats: If given, a collections.Counter to add cost.STATS_KEYS counts to
+        :param causes: If given, a list to extend with why each program was inviable: one of cost.INVIABLE_CAUSES, or
+                None
+        :return: A list of costs (or False for inviable programs), in the same order as programs
+        """
+        self.suite = cost.get_suite(self.inputs, self.targets, cost_options, self.suite)
+        return _cost_programs(self.inputs, self.targets, programs, cost_options, bound, stats, self.suite, causes)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ProcessPoolEvaluator(SerialEvaluator):
+    """
+    Score programs in chunks on a pool of long-lived worker processes
+    """
+    def __init__(self, inputs, targets, workers=None, chunk_size=None, suite=None):
+        """
+        :param inputs: Inputs to pass to each program; sent to each worker once
+        :param targets: Expected outputs; sent to each worker once
+        :param workers: How many processes to start; None means one per CPU
+        :param chunk_size: How many programs to send per task; None picks about four chunks per worker
+        :param suite: A cost.TestSuite, sent to each worker once; each worker prepares its own if None
+        """
+        super(ProcessPoolEvaluator, self).__init__(inputs, targets, suite)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(inputs, targets, suite))
+
+    def costs(self, programs, cost_options, bound=None, stats=None, causes=None):
+        chunk_size = self.chunk_size or max(1, -(-len(programs) // (self.workers * 4)))
+        tasks = [(cost_options, bound, programs[start:start + chunk_size], causes is not None)
+                 for start in range(0, len(programs), chunk_size)]
+        program_costs = []
+        # Pool.map keeps the chunks in order, so the costs line up with programs
+        for chunk_costs, chunk_stats, chunk_causes in self.pool.map(_cost_chunk, tasks):
+            program_costs.extend(chunk_costs)
+            if stats is not None:
+                stats.update(chunk_stats)
+            if causes is not None:
+                causes.extend(chunk_causes)
+        return program_costs
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+class BatchEvaluator(SerialEvaluator):
+    """
+    Score the whole population in lockstep with the NumPy batch interpreter; needs a step budget
+    """
+    def costs(self, programs, cost_options, bound=None, stats=None, causes=None):
+        self.suite = cost.get_suite(self.inputs, self.targets, cost_options, self.suite)
+        return cost.cost_function_batch(self.inputs, self.targets, programs, options=cost_options, bound=bound,
+                                        stats=stats, suite=self.suite, causes=causes)
+
+
+class CachingEvaluator(object):
+    """
+    Wrap another evaluator, only passing it programs whose normalized form has not been scored yet
+    """
+    def __init__(self, evaluator, size):
+        """
+        :param evaluator: The evaluator that does the actual scoring
+        :param size: How many costs to keep in the FitnessCache
+        """
+        self.evaluator = evaluator
+        self.cache = cache.FitnessCache(size)
+        self.cost_options = None
+
+    def costs(self, programs, cost_options, bound=None, stats=None, causes=None):
+        # Costs only stay valid while the options do; time_cost is toggled by stagnation, so it goes in the key instead
+        if cost_options._replace(time_cost=False) != self.cost_options:
+            self.cache.clear()
+            self.cost_options = cost_options._replace(time_cost=False)
+
+        program_costs = [None] * len(programs)
+        program_causes = [None] * len(programs)
+        pending = {}  # Cache key -> indices of the programs waiting on it
+        # A length_cost makes every symbol count, and a step budget every step run, so then programs are only merged if
+        #   they are the same
+        keep_timing = cost_options.time_cost or bool(cost_options.length_cost) or cost_options.timeout_unit == 'steps'
+        for program_index, program in enumerate(programs):
+            key = (cost_options.time_cost, cache.normalize_program(program, keep_timing, cost_options.pointer_policy))
+            if key in pending:
+                # A duplicate within this generation; it will share its twin's cost
+                pending[key].append(program_index)
+                self.cache.hits += 1
+                continue
+            cached = self.cache.lookup(key)
+            if cached is None:
+                pending[key] = [program_index]
+            else:
+                program_costs[program_index], program_causes[program_index] = cached
+                if stats is not None and cached[1] is not None:
+                    stats[cached[1]] += 1
+
+        keys = list(pending)
+        new_causes = []
+        # Only the programs actually run add steps to stats, but every inviable program adds its cause, whether it was
+        #   run, a duplicate of one that was, or cached
+        new_costs = self.evaluator.costs([programs[pending[key][0]] for key in keys], cost_options, bound, stats,
+                                         new_causes)
+        for key, program_cost, program_cause in zip(keys, new_costs, new_causes):
+            if program_cost != cost.OVER_BOUND:
+                # Abandoned costs depend on the bound, so only exact ones are kept; with them, why it was inviable
+                self.cache.store(key, (program_cost, program_cause))
+            for program_index in pending[key]:
+                program_costs[program_index], program_causes[program_index] = program_cost, program_cause
+            if stats is not None and program_cause is not None:
+                stats[program_cause] += len(pending[key]) - 1
+        if causes is not None:
+            causes.extend(program_causes)
+        return program_costs
+
+    def close(self):
+        self.evaluator.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def make_evaluator(inputs, targets, backend='serial', workers=None, chunk_size=None, cache_size=0, suite=None):
+    """
+    Build the evaluator for an evolution run
+    :param inputs: Inputs to pass to each program
+    :param targets: Expected outputs
+    :param backend: 'serial', 'process' or 'numpy'
+    :param workers: Worker count for the 'process' backend
+    :param chunk_size: Programs per task for the 'process' backend
+    :param cache_size: How many costs to memoize; 0 disables the cache
+    :param suite: A cost.TestSuite prepared from inputs and targets, or None to prepare one when first needed
+    :return: An evaluator; close it (or use it as a context manager) when done
+    """
+    if backend == 'serial':
+        evaluator = SerialEvaluator(inputs, targets, suite)
+    elif backend == 'process':
+        evaluator = ProcessPoolEvaluator(inputs, targets, workers, chunk_size, suite)
+    elif backend == 'numpy':
+        if batch.numpy is None:
+            raise ImportError("The 'numpy' evaluation backend requires NumPy.")
+        evaluator = BatchEvaluator(inputs, targets, suite)
+    else:
+        raise ValueError("backend must be one of {}, not {!r}.".format(EVALUATION_BACKENDS, backend))
+    if cache_size:
+        evaluator = CachingEvaluator(evaluator, cache_size)
+    return evaluator
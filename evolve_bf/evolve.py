@@ -3,28 +3,47 @@
 # Example: evolve_bf_program(['1', '2'], ['Hello, world!', '!dlrow ,olleH']) will evolve a program which, given 1 as
 #   an input, prints Hello, world! and, given 2 as an input, prints the reverse.
 
-from collections import namedtuple
-from random import shuffle, choice, randint
-from evolve_bf import cost, mutate, common, cross, interpret
+import multiprocessing
+import random
+import time
+from collections import namedtuple, Counter
+from random import shuffle
+from evolve_bf import cost, mutate, cross, interpret, evaluation, metrics, checkpoint, population, selection, analysis
 
 MappedProgram = namedtuple("MappedProgram", ["cost", "program"])
-ProgramReport = namedtuple("ProgramReport", ["program", "cost", "generations", "output"])
+# stopped_by: None if the program is correct, or which budget ran out first ('generation_limit', 'time_limit',
+#   'evaluation_limit' or 'step_limit'), in which case the program is the best found before then
+ProgramReport = namedtuple("ProgramReport", ["program", "cost", "generations", "output", "stopped_by"],
+                           defaults=[None])
+BUDGETS = ('generation_limit', 'time_limit', 'evaluation_limit', 'step_limit')
 EvolveOptions = namedtuple("EvolveOptions", ['cull_ratio', 'population_size', 'initial_program_size',
                                              'program_timeout', 'generation_limit', 'verbose', 'cost_options', 'stagnation_generations',
-                                             'mutate_options'])
+                                             'mutate_options', 'timeout_unit', 'evaluation_backend', 'evaluation_workers',
+                                             'evaluation_chunk_size', 'fitness_cache_size', 'abandon_over_cull_cost',
+                                             'metrics_hook', 'checkpoint_path', 'checkpoint_interval',
+                                             'selection_scheme', 'tournament_size', 'elitism', 'simplify_interval',
+                                             'time_limit', 'evaluation_limit', 'step_limit'],
+                           defaults=[None, 'serial', None, None, 10000, True, None, None, 10, 'truncation', 2, 0, 0,
+                                     None, None, None])
 
 default_evolve_options = EvolveOptions(cull_ratio = 0.5, population_size = 1000, initial_program_size = 8,
-                                       program_timeout = 20, generation_limit = 10000, stagnation_generations = 10,
+                                       program_timeout=None, generation_limit = 10000, stagnation_generations = 10,
                                        verbose=False,
                                        cost_options=cost.default_cost_options,
-                                       mutate_options=mutate.default_mutate_options)
+                                       mutate_options=mutate.default_mutate_options,
+                                       timeout_unit=None,
+                                       evaluation_backend='serial', evaluation_workers=None, evaluation_chunk_size=None,
+                                       fitness_cache_size=10000, abandon_over_cull_cost=True, metrics_hook=None,
+                                       checkpoint_path=None, checkpoint_interval=10, selection_scheme='truncation',
+                                       tournament_size=2, elitism=0, simplify_interval=0, time_limit=None,
+                                       evaluation_limit=None, step_limit=None)
 
 
 def get_key_for_MappedProgram(mapped_program):
     return mapped_program.cost
 
 
-def evolve_bf_program(inputs, targets, options = default_evolve_options):
+def evolve_bf_program(inputs, targets, options = default_evolve_options, suite=None):
     """
     Use the genetic algorithm to create a BF program that, given each input, computes the corresponding output.
     :param inputs: A list of inputs which produce a corresponding output
@@ -33,72 +52,179 @@ def evolve_bf_program(inputs, targets, options = default_evolve_options):
             .5 kill fewer, meaning that the population grows, and values greater than it kill more,
     :param population_size: The initial size of the population (P_0). May grow or shrink depending on other inputs
     :param initial_program_size: How long programs start out as being
-    :param program_timeout: How long each organism may run for, ms
+    :param program_timeout: How long each organism may run for, in timeout_unit
+    :param timeout_unit: 'ms' or 'steps'; see interpret.evaluate. Each of these two that is not None replaces its
+            counterpart in cost_options; see get_cost_options.
     :param verbose: Print on every generation, or no?
+    :param evaluation_backend: 'serial' to score programs in this process, 'process' to score them on a pool of
+            evaluation_workers processes (one per CPU if None), evaluation_chunk_size programs per task, or 'numpy' to
+            score each generation in lockstep with the batch interpreter (needs NumPy and timeout_unit='steps')
+    :param fitness_cache_size: How many costs to memoize by normalized program text; 0 disables the cache
+    :param abandon_over_cull_cost: Stop costing a program once it is worse than the last program to survive the previous
+            generation's cull; such programs are ranked last with cost.OVER_BOUND
+    :param metrics_hook: If not None, called with a metrics.GenerationMetrics after every generation; see
+            metrics.JSONLSink for writing them to a file
+    :param checkpoint_path: If not None, save a checkpoint here every checkpoint_interval generations; continue the run
+            from it with resume_bf_program
+    :param selection_scheme: How to choose the cull_ratio of each generation that survives; 'truncation' keeps the
+            cheapest, 'tournament' the winners of tournaments between tournament_size random programs, and 'rank' picks
+            at random weighted by rank. See selection.
+    :param elitism: Copy this many of the cheapest programs into the next generation unchanged
+    :param simplify_interval: Every this many generations, shorten the survivors of the cull with
+            analysis.simplify_program, which keeps their output the same; 0 never does. Together with a length_cost in
+            cost_options, this keeps programs from bloating.
+    :param generation_limit: Stop after evaluating this many generations
+    :param time_limit: If not None, stop once this many seconds have passed
+    :param evaluation_limit: If not None, stop once this many programs have been evaluated
+    :param step_limit: If not None, stop once the programs evaluated have run this many BF symbols between them
+    :param suite: A cost.TestSuite from cost.prepare_suite(inputs, targets, options.cost_options), to reuse across
+            runs on the same problem; prepared once for this run if None
+    :return: A ProgramReport for the first program with a cost of zero. If a budget runs out first, one for the best
+            program found so far, with its cost and the budget in stopped_by; None if not even one generation was
+            evaluated. Budgets are checked between generations, so the last generation may go a little over them.
     """
+    evaluator = evaluation.make_evaluator(inputs, targets, options.evaluation_backend, options.evaluation_workers,
+                                          options.evaluation_chunk_size, options.fitness_cache_size, suite)
+    try:
+        return _evolve(inputs, targets, options, evaluator)
+    finally:
+        evaluator.close()
 
+
+def resume_bf_program(path, options=None):
+    """
+    Continue an evolution from a checkpoint saved by evolve_bf_program
+    :param path: The checkpoint_path of the run
+    :param options: EvolveOptions to continue with; None uses the run's own, without its metrics_hook. Options that
+            change how programs are costed or bred make the run differ from one that was never stopped. The time,
+            evaluation and step budgets start again from zero.
+    :return: As evolve_bf_program
+    """
+    saved = checkpoint.load_checkpoint(path)
+    if options is None:
+        options = saved.options
+    evaluator = evaluation.make_evaluator(saved.inputs, saved.targets, options.evaluation_backend,
+                                          options.evaluation_workers, options.evaluation_chunk_size,
+                                          options.fitness_cache_size)
+    try:
+        return _evolve(saved.inputs, saved.targets, options, evaluator, saved)
+    finally:
+        evaluator.close()
+
+
+def _evolve(inputs, targets, options, evaluator, resume_from=None, migrate=None):
+    """
+    The generation loop of evolve_bf_program; evaluator scores each generation
+    :param resume_from: A checkpoint.Checkpoint to carry on from, or None to start a new run
+    :param migrate: If not None, called after every cull with (generation, survivors), the survivors best first; it
+            returns the survivors to breed from, so it can swap programs with other populations (see islands)
+    """
     # Check the inputs and outputs for nonstrings, convert them to strings
 
     # Generate an initial population
 
-    current_population = generate_population(options.population_size, options.initial_program_size)
-    # This is population P_0 and, at the beginning, P_g as well.
-    interstitial_population = [] # This is I, the mutated but non-crossed generation
-    new_population = []  # P_g+1
+    # Each generation is kept packed in a population.Population; it is unpacked once, to be costed and bred
+    mutation_engine = mutate.MutationEngine(options.mutate_options)
+
+    if resume_from is None:
+        current_population = population.Population.generate(options.population_size, options.initial_program_size)
+        # This is population P_0 and, at the beginning, P_g as well.
 
-    generations = 0  # This is g
+        generations = 0  # This is g
+
+        last_cost = 0
+        flat_generations = 0
+        stagnant = False
+        cull_cost = None  # The cost of the last survivor of the previous cull
+        best = None  # The best MappedProgram so far
+    else:
+        current_population, generations = resume_from.population, resume_from.generation
+        last_cost, flat_generations, stagnant = resume_from.last_cost, resume_from.flat_generations, resume_from.stagnant
+        cull_cost, best = resume_from.cull_cost, resume_from.best
+        random.setstate(resume_from.random_state)
+        if resume_from.cache_state is not None and getattr(evaluator, 'cache', None) is not None:
+            evaluator.cache, evaluator.cost_options = resume_from.cache_state
 
-    winner = ProgramReport("",0,0,"")
-    
-    last_cost = 0
-    flat_generations = 0
-    stagnant = False
+    base_cost_options = get_cost_options(options)
+    started = time.perf_counter()
+    evaluations = 0  # Programs evaluated by this call, for evaluation_limit
+    steps_run = 0  # BF symbols they ran, for step_limit
     while True:
+        if options.checkpoint_path is not None and generations % options.checkpoint_interval == 0:
+            fitness_cache = getattr(evaluator, 'cache', None)
+            checkpoint.save_checkpoint(options.checkpoint_path, checkpoint.Checkpoint(
+                inputs=inputs, targets=targets, options=options._replace(metrics_hook=None),
+                population=current_population, generation=generations,
+                last_cost=last_cost, flat_generations=flat_generations, stagnant=stagnant, cull_cost=cull_cost,
+                best=best, random_state=random.getstate(),
+                cache_state=(fitness_cache, evaluator.cost_options) if fitness_cache is not None else None))
+
+        stopped_by = _exhausted_budget(options, generations, time.perf_counter() - started, evaluations, steps_run)
+        if stopped_by is not None:
+            if options.verbose:
+                print("Stopping at gen. {}: {} reached.".format(generations, stopped_by))
+            if best is None:
+                return None
+            return _make_report(inputs, best.program, best.cost, generations, options, stopped_by)
+
         # Test the cost of each member of P_g
         #print(current_population)
-        cost_mapping = []
         replacements_required = 0  # How many inviable programs need replacing.
+        if stagnant:
+            cost_options = base_cost_options._replace(time_cost=True)
+        else:
+            cost_options = base_cost_options
+        fitness_cache = getattr(evaluator, 'cache', None)
+        cache_counts = (fitness_cache.hits, fitness_cache.misses) if fitness_cache is not None else None
+        stats = Counter()
+        timer = time.perf_counter()
+        programs = current_population.programs()
+        program_costs = evaluator.costs(programs, cost_options,
+                                        cull_cost if options.abandon_over_cull_cost else None, stats)
+        timings = {'evaluation_time': time.perf_counter() - timer}
+        evaluations += len(current_population)
+        steps_run += stats['steps']
+
+        viable = []  # Indices into current_population of the programs that can be ranked
         for program_index in range(0, len(current_population)):
-            current_program = current_population[program_index]
-            if stagnant:
-                cost_options = options.cost_options._replace(time_cost=True)
-            else:
-                cost_options = options.cost_options
-            current_program_cost = cost.cost_function(inputs, targets, current_program, 
-                                                      options=cost_options)
+            current_program_cost = program_costs[program_index]
             if current_program_cost is False:
                 # In this case, the program is broken; cull it and replace it.
                 replacements_required += 1
             else:
-                cost_mapping.append(MappedProgram(cost=current_program_cost,
-                                                  program=current_program))
-                # In this way, cost_mapping[0] is (cost_of_P_g[0], P_g[0])
-                 
+                viable.append(program_index)
+
                 # Test this program has a cost of zero; if so, return. We are done.
                 if current_program_cost == 0:
-                    winner_output = "\n"
-                    for input_string_index in range(0, len(inputs)):
-                        winner_output += "{}:{}\n".format(inputs[input_string_index],
-                                                          interpret.evaluate(current_program,
-                                                                             inputs[input_string_index]))
-                    winner = ProgramReport(program = current_program,
-                                           cost = current_program_cost,
-                                           generations = generations,
-                                           output = winner_output)
+                    winner = _make_report(inputs, programs[program_index], current_program_cost, generations,
+                                          options)
+                    _report_metrics(options, generations, programs, program_costs, stats, fitness_cache,
+                                    cache_counts, timings)
                     return winner  # There is a winner, so break out of the loop
 
-        # Sort the cost mapping to prepare for culling
-        sorted_cost_mapping = sorted(cost_mapping, key=get_key_for_MappedProgram)
+        # Choose the survivors, cheapest first; only truncation's cheapest few need putting in order
+        timer = time.perf_counter()
+        viable_costs = [program_costs[program_index] for program_index in viable]
+        center_number = int(len(viable) * options.cull_ratio)
+        survivors = [viable[survivor] for survivor in selection.select_survivors(viable_costs, center_number,
+                                                                                 options.selection_scheme,
+                                                                                 options.tournament_size)]
+        elites = [programs[viable[elite]] for elite in selection.truncate(viable_costs, options.elitism)]
+        generation_best = viable[selection.best_index(viable_costs)]
+        generation_best = MappedProgram(cost=program_costs[generation_best], program=programs[generation_best])
+        timings['sort_time'] = time.perf_counter() - timer
+        if best is None or generation_best.cost < best.cost:
+            best = generation_best
 
         # Figure out if we are stagnating
-        if sorted_cost_mapping[0].cost == last_cost:
+        if generation_best.cost == last_cost:
             flat_generations += 1  # We have been stagnant for this many generations
             if flat_generations >= options.stagnation_generations:
                 stagnant = True
         else:
             stagnant = False
             flat_generations = 0
-            last_cost = sorted_cost_mapping[0].cost 
+            last_cost = generation_best.cost
 
         if options.verbose:
             # Report on the current winner:
@@ -106,80 +232,150 @@ def evolve_bf_program(inputs, targets, options = default_evolve_options):
                 print("Gen. {}: {} programs, {} inviable. Min. cost {} \n{}\n{}\n".format(generations, 
                                                                                           len(current_population),
                                                                                           replacements_required,
-                                                                                          sorted_cost_mapping[0].cost,
-                                                                                          sorted_cost_mapping[0].program,
-                                                                                          interpret.evaluate(sorted_cost_mapping[0].program,
+                                                                                          generation_best.cost,
+                                                                                          generation_best.program,
+                                                                                          interpret.evaluate(generation_best.program,
                                                                                                              inputs[0],
-                                                                                                             timeout=options.program_timeout)))
+                                                                                                             timeout=cost_options.program_timeout,
+                                                                                                             timeout_unit=cost_options.timeout_unit,
+                                                                                                             tape_size=cost_options.tape_size,
+                                                                                                             pointer_policy=cost_options.pointer_policy)))
             except interpret.TimeoutAbortException:
                 print("Timeout on gen. " + str(generations))
-        # Kill cull_ratio of P_g, starting with those with the largest cost, removing cost mappings in the process
-        center_number = int(len(sorted_cost_mapping) * options.cull_ratio)
-        culled_population = [mapped_program.program for mapped_program in sorted_cost_mapping[:center_number]]
-        # Explanation: loop through sorted_cost_mapping, stripping cost mappings, until we hit center_number.
-        # The rest are killed.
+            except interpret.TapeBoundsException:
+                print("Left the tape on gen. " + str(generations))
+            if fitness_cache is not None:
+                print("Fitness cache: {} hits, {} misses, {} entries\n".format(fitness_cache.hits, fitness_cache.misses,
+                                                                               len(fitness_cache)))
+        # Kill all but the survivors of P_g
+        timer = time.perf_counter()
+        culled_population = [programs[survivor] for survivor in survivors]
+        if options.simplify_interval and generations % options.simplify_interval == 0:
+            culled_population = [analysis.simplify_program(program, options.cost_options.pointer_policy)
+                                 for program in culled_population]
+        if survivors and program_costs[survivors[-1]] != cost.OVER_BOUND:
+            cull_cost = program_costs[survivors[-1]]
+        else:
+            # The bound was too tight to rank enough programs; cost the next generation in full
+            cull_cost = None
+        timings['cull_time'] = time.perf_counter() - timer
+        if migrate is not None:
+            culled_population = migrate(generations, culled_population)
         # Now, we replace inviable programs with half mutated versions of the current winner and half new programs.
-        for replacement_number in range(0, int(replacements_required/4)+1):
-            culled_population.append(mutate.mutation_function(sorted_cost_mapping[0].program, 
-                                                              options.mutate_options))
+        timer = time.perf_counter()
+        culled_population += mutation_engine.mutate_population([generation_best.program] *
+                                                               (int(replacements_required/4)+1))
+        mutation_time = time.perf_counter() - timer
         # Pick a random length of program, then generate replacements with that length. (culled_population
         #   shuffled, so culled_population[0] is a random program.
-        culled_population += generate_population(int(replacements_required/4)+1, len(culled_population[0])) 
+        timer = time.perf_counter()
+        culled_population += generate_population(int(replacements_required/4)+1, len(culled_population[0]))
+        timings['generation_time'] = time.perf_counter() - timer
         # Replicate-with-errors from P_g to I
-        interstitial_population = [mutate.mutation_function(program, options.mutate_options) for program in
-                                   culled_population]
-        #print(interstitial_population)
+        timer = time.perf_counter()
+        interstitial_population = mutation_engine.mutate_population(culled_population)
+        timings['mutation_time'] = mutation_time + time.perf_counter() - timer
 
         # Cross P_g with I, creating P_g+1
+        timer = time.perf_counter()
         shuffle(culled_population)
         shuffle(interstitial_population)
-        for population_index in range(0, len(culled_population)):
-            #print(population_index, len(culled_population), len(interstitial_population))
-            n, nprime = cross.crossing_function(culled_population[population_index],
-                                              interstitial_population[population_index])
-            new_population.append(n)
-            new_population.append(nprime)
+        new_population = [child for program_a, program_b in zip(culled_population, interstitial_population)
+                          for child in cross.crossing_function(program_a, program_b)]
         shuffle(new_population)
         # The new blood/old blood method grows the population; here we cut it down to size.
         new_population = new_population[:options.population_size]
+        if elites:
+            # The cheapest programs carry on unchanged; a low cull_ratio can breed fewer programs than there is room for
+            new_population = elites + new_population[:max(0, options.population_size - len(elites))]
+        new_population = population.Population.from_programs(new_population)
+        timings['crossover_time'] = time.perf_counter() - timer
+        _report_metrics(options, generations, programs, program_costs, stats, fitness_cache, cache_counts, timings)
 
         # g = g+1
         current_population = new_population
-        interstitial_population = []
-        new_population = []
         generations += 1
 
 
+def get_cost_options(options):
+    """
+    Find the CostOptions programs are costed with during an evolution
+    :param options: An EvolveOptions
+    :return: options.cost_options, with the program_timeout and timeout_unit of options where they are not None
+    """
+    cost_options = options.cost_options
+    if options.program_timeout is not None:
+        cost_options = cost_options._replace(program_timeout=options.program_timeout)
+    if options.timeout_unit is not None:
+        cost_options = cost_options._replace(timeout_unit=options.timeout_unit)
+    return cost_options
+
+
+def _exhausted_budget(options, generations, elapsed, evaluations, steps_run):
+    """
+    Find whether a budget has run out
+    :return: The name of the first budget in BUDGETS to run out, or None
+    """
+    if generations >= options.generation_limit:
+        return 'generation_limit'
+    if options.time_limit is not None and elapsed >= options.time_limit:
+        return 'time_limit'
+    if options.evaluation_limit is not None and evaluations >= options.evaluation_limit:
+        return 'evaluation_limit'
+    if options.step_limit is not None and steps_run >= options.step_limit:
+        return 'step_limit'
+    return None
+
+
+def _make_report(inputs, program, program_cost, generations, options, stopped_by=None):
+    """
+    Run a program on every input for its ProgramReport
+    """
+    cost_options = get_cost_options(options)
+    program_output = "\n"
+    for input_string in inputs:
+        try:
+            result = interpret.evaluate(program, input_string, timeout=cost_options.program_timeout,
+                                        timeout_unit=cost_options.timeout_unit, tape_size=cost_options.tape_size,
+                                        pointer_policy=cost_options.pointer_policy)
+        except interpret.TimeoutAbortException:
+            result = "(timed out)"
+        except interpret.TapeBoundsException:
+            result = "(left the tape)"
+        program_output += "{}:{}\n".format(input_string, result)
+    return ProgramReport(program=program, cost=program_cost, generations=generations, output=program_output,
+                         stopped_by=stopped_by)
+
+
+def _report_metrics(options, generation, population, program_costs, stats, fitness_cache, cache_counts, timings):
+    """
+    Pass a generation's GenerationMetrics to options.metrics_hook, if there is one
+    :param cache_counts: The fitness cache's (hits, misses) before this generation was evaluated
+    :param timings: A dict of the *_time fields measured so far
+    """
+    if options.metrics_hook is None:
+        return
+    costed = [program_cost for program_cost in program_costs if program_cost is not False]
+    options.metrics_hook(metrics.GenerationMetrics(
+        generation=generation, population_size=len(population), best_cost=min(costed) if costed else None,
+        syntax_errors=stats['syntax_errors'], timeouts=stats['timeouts'], tape_errors=stats['tape_errors'],
+        abandoned=program_costs.count(cost.OVER_BOUND), steps=stats['steps'],
+        mean_program_length=sum(map(len, population)) / max(1, len(population)),
+        cache_hits=None if fitness_cache is None else fitness_cache.hits - cache_counts[0],
+        cache_misses=None if fitness_cache is None else fitness_cache.misses - cache_counts[1],
+        evaluation_time=timings['evaluation_time'], sort_time=timings.get('sort_time', 0),
+        cull_time=timings.get('cull_time', 0), mutation_time=timings.get('mutation_time', 0),
+        crossover_time=timings.get('crossover_time', 0), generation_time=timings.get('generation_time', 0)))
+
+
 def generate_population(individuals, length=10):
-    i = 0
-    population = []
-    while i < individuals:
-        individual = ""
-        program_index = 0
-        while program_index < length:
-            # Randomly choose a symbol
-            next_command = choice(common.valid_commands_no_end_loop)
-            if next_command == '[':  # We're starting a new loop
-                if length - program_index <= 3:
-                    # No room for a loop.
-                    next_command = choice(common.valid_commands_no_loops)
-                else:
-                    individual += '['   # Start the loop; adding this to program_index is handled by the outer while
-                                        #  (it thinks this is all  one char)
-                    inside_loop_length = randint(1, length - (program_index+1)) #  i+1 to leave room for ]
-                    j = 0
-                    while j < inside_loop_length:
-                        individual += choice(common.valid_commands_no_loops)
-                        j += 1
-                    # Close off the loop
-                    individual += ']'
-                    program_index += inside_loop_length + 1  # The 1 is for the closing ']'
-            else:
-                individual += next_command
-            program_index += 1
-        i += 1
-        population.append(individual)
-    return population
+    """
+    Generate random balanced programs
+    :param individuals: How many programs to generate
+    :param length: How long each program is
+    :return: A list of programs
+    """
+    return population.Population.generate(individuals, length).programs()
 
 
 def report_evolution(results):
@@ -190,20 +386,39 @@ def report_evolution(results):
     """
     if results is None:
         return False
+    elif results.stopped_by is not None:
+        print("Stopped by {} with cost {}.\nGeneration {}:\n\t{}\ngiving:{}".format(
+            results.stopped_by, results.cost, results.generations, results.program, results.output))
+        return False
     else:
         print("Success!\nGeneration {}:\n\t{}\ngiving:{}".format(results.generations, results.program, results.output))
         return True
 
 
-def supervised_evolve(inputs, outputs, evolve_options=default_evolve_options, retry=5):
+def supervised_evolve(inputs, outputs, evolve_options=default_evolve_options, retry=5, race=False, seed=None):
     """
     Run an evolution, restarting if evolution fails
     :param inputs: Inputs to the evolving program
     :param outputs: Outputs expected from the evolving program
     :param evolve_options: An EvolveOptions for the evolution function
     :param retry: How many times to retry; 0 is try forever.
+    :param race: If True, run retry attempts at once in separate processes (one per CPU if retry is 0) and keep the first
+            to succeed, stopping the rest; see islands.race_evolve
+    :param seed: With race, attempt i seeds its RNG with seed + i
     :return: The successful program
     """
+    if race:
+        # Imported here, as islands builds on this module
+        from evolve_bf import islands
+        attempts = retry or multiprocessing.cpu_count()
+        winner, result, generation_counts = islands.race_evolve(inputs, outputs, evolve_options, attempts, seed)
+        print("Generations run by each attempt: {}".format(generation_counts))
+        if result is None:
+            return False
+        print("Attempt {} of {} succeeded!".format(winner + 1, attempts))
+        report_evolution(result)
+        return result.program
+
     tries = 1
     while True:
         if tries > retry:
@@ -217,7 +432,7 @@ def supervised_evolve(inputs, outputs, evolve_options=default_evolve_options, re
         except SystemExit:
             print("Supervised evolution exiting prematurely: system exit.")
             raise
-        if result is not None:
+        if result is not None and result.cost == 0:
             print("After {} tries, evolution succeeded!".format(tries))
             report_evolution(result)
             return result.program
@@ -4,6 +4,7 @@
 # Modified for in-program evaluation 2015 Leo Tindall
 
 import time
+from collections import namedtuple
 
 class TimeoutAbortException(Exception):
     pass
@@ -11,6 +12,97 @@ class TimeoutAbortException(Exception):
 class BFSyntaxException(Exception):
     pass
 
+class TapeBoundsException(Exception):
+    pass
+
+
+# Opcodes for compiled programs. A compiled program is a flat list of these with parallel lists of integer arguments
+#   and weights; an op's weight is how many BF symbols it stands for, which is what steps are counted in:
+#   OP_ADD:      add args[i] (already reduced mod 256) to the current cell; folds runs of + and -
+#   OP_MOVE:     move the cell pointer by args[i]; folds runs of > or of <
+#   OP_OUTPUT:   . - args[i] is unused (0)
+#   OP_INPUT:    , - args[i] is unused (0)
+#   OP_OPEN:     [ - args[i] is the index of the matching OP_CLOSE
+#   OP_CLOSE:    ] - args[i] is the index of the matching OP_OPEN (or OP_MULTIPLY)
+#   OP_CLEAR:    [-] or [+] - args[i] is +1 or -1, what one iteration does to the cell
+#   OP_MULTIPLY: a balanced move/add loop such as [->+<]. args[i] is the index of the matching OP_CLOSE, and loops[i]
+#                is a MultiplyLoop. The loop body is still compiled after this op, so it falls back to being a plain [
+#                if the fast path cannot be taken.
+OP_ADD, OP_MOVE, OP_OUTPUT, OP_INPUT, OP_OPEN, OP_CLOSE, OP_CLEAR, OP_MULTIPLY = range(8)
+
+CompiledProgram = namedtuple("CompiledProgram", ['code', 'ops', 'args', 'weights', 'loops'])
+# close: index of the matching OP_CLOSE
+# step: +1 or -1, what one iteration does to the loop counter cell
+# min_offset, max_offset: how far the body strays from the loop counter cell
+# changes: a tuple of (offset, delta) pairs applied to other cells on each iteration
+MultiplyLoop = namedtuple("MultiplyLoop", ['close', 'step', 'min_offset', 'max_offset', 'changes'])
+
+# The result of running a program against a target:
+# output: what the program printed (cut short if complete is False)
+# elapsed: seconds for 'ms' timeouts, steps for 'steps'
+# mismatch: the sum of abs(ord(expected) - ord(actual)) over the target's length, plus ord(actual) for any extra chars
+# complete: False if the run was stopped early by output_slack or mismatch_bound
+# steps: how many BF symbols were executed, whatever the timeout_unit
+ScoredRun = namedtuple("ScoredRun", ['output', 'elapsed', 'mismatch', 'complete', 'steps'])
+
+TIMEOUT_UNITS = ('ms', 'steps')
+
+# The tape is a bytearray of TAPE_SIZE cells to start with. What happens when the cell pointer leaves it depends on the
+#   pointer policy:
+#   'clamp': < stops at the first cell, and the tape doubles in size whenever > runs off the end (the classic behaviour)
+#   'wrap':  the tape is fixed at tape_size cells and the pointer wraps around at both ends
+#   'error': the tape is fixed at tape_size cells and leaving it raises TapeBoundsException
+TAPE_SIZE = 1024
+POINTER_POLICIES = ('clamp', 'wrap', 'error')
+
+# Bytes mode: if the input is bytes or a bytearray rather than a str, it is read as raw byte values, the output comes back
+#   as bytes, and a target should be bytes as well. No chars are created or converted while the program runs.
+BYTES_TYPES = (bytes, bytearray)
+
+
+# An input or target converted once into what execute reads, for text that is run against many programs:
+#   codes: the code of each char. Input codes are masked to bytes and end with a 0 terminator, which reads past the end
+#       of the input return; target codes are kept whole, as a list for a str or as bytes in bytes mode.
+#   bytes_mode: whether the text was bytes, and so whether the output comes back as bytes
+PreparedText = namedtuple("PreparedText", ['codes', 'bytes_mode'])
+
+
+def char_codes(text):
+    """
+    Get the code of each char in an input or target
+    :param text: A str, bytes/bytearray in bytes mode, or a PreparedText from prepare_target
+    :return: Something that can be indexed for ints; bytes are returned as they are
+    """
+    if isinstance(text, PreparedText):
+        return text.codes
+    if isinstance(text, BYTES_TYPES):
+        return text
+    return [ord(character) for character in text]
+
+
+def prepare_input(text):
+    """
+    Convert an input for execute once, so that runs on it do not each convert it again
+    :param text: A str, bytes/bytearray for bytes mode, or a PreparedText, which is returned as it is
+    :return: A PreparedText
+    """
+    if isinstance(text, PreparedText):
+        return text
+    if isinstance(text, BYTES_TYPES):
+        return PreparedText(codes=bytes(text) + b"\0", bytes_mode=True)
+    return PreparedText(codes=bytes([ord(character) & 255 for character in text] + [0]), bytes_mode=False)
+
+
+def prepare_target(text):
+    """
+    Convert a target for execute once
+    :param text: A str, bytes/bytearray for bytes mode, or a PreparedText, which is returned as it is
+    :return: A PreparedText
+    """
+    if isinstance(text, PreparedText):
+        return text
+    return PreparedText(codes=char_codes(text), bytes_mode=isinstance(text, BYTES_TYPES))
+
 
 def buildbracemap(code):
     temp_bracestack, bracemap = [], {}
@@ -32,61 +124,329 @@ def cleanup(code):
     return list(filter(lambda x: x in ['.', ',', '[', ']', '<', '>', '+', '-'], code))
 
 
-def evaluate(code, input_string, timeout = 5, return_time=False):
-    # if return_time = True, we need to return a tuple (output, time)
-    code     = cleanup(list(code))
-    bracemap = buildbracemap(code)
+def analyze_loop_body(body):
+    """
+    Work out whether a loop body with no nested loops or I/O is a clear or move/add idiom
+    :param body: The BF code between a [ and its ]
+    :return: A (step, min_offset, max_offset, changes) tuple, or None if the body is not an idiom
+    """
+    offset, min_offset, max_offset = 0, 0, 0
+    deltas = {}
+    for command in body:
+        if command == '>':
+            offset += 1
+            max_offset = max(max_offset, offset)
+        elif command == '<':
+            offset -= 1
+            min_offset = min(min_offset, offset)
+        elif command == '+':
+            deltas[offset] = deltas.get(offset, 0) + 1
+        elif command == '-':
+            deltas[offset] = deltas.get(offset, 0) - 1
+        else:
+            return None
+    if offset != 0:
+        return None
+    step = deltas.pop(0, 0) % 256
+    if step not in (1, 255):
+        # The loop counter does not move by exactly one, so the iteration count is not simply the cell value
+        return None
+    step = 1 if step == 1 else -1
+    changes = tuple((change_offset, delta % 256) for change_offset, delta in sorted(deltas.items())
+                    if delta % 256 != 0)
+    return step, min_offset, max_offset, changes
+
 
-    cells, codeptr, cellptr, input_index = [0], 0, 0, 0
-    output = ""
-    input_string += chr(0)  # Add a terminator; programs like cat can break if this is not done.
+def compile_program(code):
+    """
+    Compile BF code into a run-length-encoded op list with pre-linked brackets
+    :param code: The BF program; non-BF characters are ignored
+    :return: A CompiledProgram
+    """
+    code = "".join(cleanup(code))
+    ops, args, weights = [], [], []
+    loops = {}
+    open_stack = []
+    position = 0
+    length = len(code)
+    while position < length:
+        command = code[position]
+        if command == '+' or command == '-':
+            run_start, delta = position, 0
+            while position < length and (code[position] == '+' or code[position] == '-'):
+                delta += 1 if code[position] == '+' else -1
+                position += 1
+            ops.append(OP_ADD)
+            args.append(delta % 256)
+            weights.append(position - run_start)
+            continue
+        if command == '>' or command == '<':
+            run_end = position
+            while run_end < length and code[run_end] == command:
+                run_end += 1
+            ops.append(OP_MOVE)
+            args.append(run_end - position if command == '>' else position - run_end)
+            weights.append(run_end - position)
+            position = run_end
+            continue
+
+        if command == '.':
+            ops.append(OP_OUTPUT)
+            args.append(0)
+            weights.append(1)
+        elif command == ',':
+            ops.append(OP_INPUT)
+            args.append(0)
+            weights.append(1)
+        elif command == '[':
+            body_end = position + 1
+            while body_end < length and code[body_end] not in '[]':
+                body_end += 1
+            idiom = None
+            if body_end < length and code[body_end] == ']':
+                idiom = analyze_loop_body(code[position + 1:body_end])
+            if idiom is not None and idiom[3] == () and idiom[1] == 0 and idiom[2] == 0:
+                # [-] or [+]: the whole loop becomes one op, weighted by its body length
+                ops.append(OP_CLEAR)
+                args.append(idiom[0])
+                weights.append(body_end - position - 1)
+                position = body_end + 1
+                continue
+            open_stack.append((len(ops), idiom))
+            ops.append(OP_MULTIPLY if idiom is not None else OP_OPEN)
+            args.append(-1)  # Filled in when the matching ] is found
+            # A plain [ is one step; a move/add loop taken all at once is weighted by its body length
+            weights.append(1 if idiom is None else body_end - position - 1)
+        else:
+            try:
+                open_index, idiom = open_stack.pop()
+            except IndexError:
+                raise BFSyntaxException("Loop close without loop open at {}.".format(position))
+            close_index = len(ops)
+            args[open_index] = close_index
+            if idiom is not None:
+                loops[open_index] = MultiplyLoop(close_index, *idiom)
+            ops.append(OP_CLOSE)
+            args.append(open_index)
+            weights.append(1)
+        position += 1
 
-    time_begin = time.time() # We count from here for the timeout
-    time_target = time_begin + (timeout / 1000)  # Convert from milliseconds
+    if open_stack:
+        raise BFSyntaxException("Loop open without loop close at op {}.".format(open_stack[-1][0]))
+    return CompiledProgram(code=code, ops=ops, args=args, weights=weights, loops=loops)
 
-    while codeptr < len(code):
-        current_time = time.time()
-        if current_time > time_target:
-            # We have spent too long in this execution. Using an exception avoids the problem that Igliu had:
-            #   https://igliu.com/program-that-writes-brainfuck/
-            #   in which his code would loop infinitely to produce a 0 return value (his abort value)
-            raise TimeoutAbortException("Your BF code timed out (ran for too long)." +
-                                        " The timeout value was {} ms. Consider raising the" +
-                                        " timeout by passing timeout={} to evaluate().".format(timeout, timeout+10))
 
-        command = code[codeptr]
+def timeout_exception(timeout, timeout_unit, steps=0):
+    exception = TimeoutAbortException("Your BF code timed out (ran for too long)."
+                                      " The timeout value was {0} {1}. Consider raising the"
+                                      " timeout by passing timeout={2} to evaluate().".format(timeout, timeout_unit,
+                                                                                             timeout + 10))
+    exception.steps = steps  # How many steps had run, for anyone keeping count
+    return exception
 
-        if command == ">":
-          cellptr += 1
-        if cellptr == len(cells): cells.append(0)
 
-        if command == "<":
-            cellptr = 0 if cellptr <= 0 else cellptr - 1
+def grow_tape(cells, cellptr):
+    """
+    Double the tape until cellptr is on it; doubling keeps the cost of growing to a constant per cell
+    :param cells: The tape, a bytearray; extended in place with zeroed cells
+    :param cellptr: The cell that must fit
+    :return: The new length of the tape
+    """
+    new_length = len(cells) * 2
+    while new_length <= cellptr:
+        new_length *= 2
+    cells.extend(bytes(new_length - len(cells)))
+    return new_length
 
-        if command == "+":
-            cells[cellptr] = cells[cellptr] + 1 if cells[cellptr] < 255 else 0
 
-        if command == "-":
-            cells[cellptr] = cells[cellptr] - 1 if cells[cellptr] > 0 else 255
+def execute(program, input_string, timeout=5, return_time=False, timeout_unit='ms', target=None, output_slack=None,
+            mismatch_bound=None, tape_size=TAPE_SIZE, pointer_policy='clamp'):
+    """
+    Run a CompiledProgram
+    :param program: The CompiledProgram to run
+    :param input_string: The input for , to read from; reading past its end gives 0. If it is bytes or a bytearray,
+            the program runs in bytes mode (see BYTES_TYPES) and the output is bytes. A PreparedText from prepare_input
+            is read as it is.
+    :param timeout: How long the program may run for, in timeout_unit
+    :param return_time: If True, return a tuple (output, elapsed), where elapsed is in seconds for 'ms' and in steps
+            for 'steps'
+    :param timeout_unit: 'ms' for a wall-clock timeout, or 'steps' for a budget of executed BF symbols. Step budgets
+            do not depend on machine load, so the same program always gets the same result.
+    :param target: If given, compare each output char against this (or a PreparedText from prepare_target) as it is
+            printed and return a ScoredRun
+    :param output_slack: With a target, stop once the output is more than this many chars longer than the target
+    :param mismatch_bound: With a target, stop once the mismatch is more than this
+    :param tape_size: How many cells to allocate up front; with the 'wrap' and 'error' policies, the size of the tape
+    :param pointer_policy: 'clamp', 'wrap' or 'error'; see POINTER_POLICIES
+    :return: The output as a string, or a ScoredRun if target is given
+    """
+    if timeout_unit not in TIMEOUT_UNITS:
+        raise ValueError("timeout_unit must be one of {}, not {!r}.".format(TIMEOUT_UNITS, timeout_unit))
+    if pointer_policy not in POINTER_POLICIES:
+        raise ValueError("pointer_policy must be one of {}, not {!r}.".format(POINTER_POLICIES, pointer_policy))
+    if tape_size < 1:
+        raise ValueError("tape_size must be at least 1, not {!r}.".format(tape_size))
+    ops, args, weights = program.ops, program.args, program.weights
+    op_count = len(ops)
+    input_codes, bytes_mode = prepare_input(input_string)
+    input_length = len(input_codes) - 1  # The index of the terminator
 
-        if command == "[" and cells[cellptr] == 0:
-            codeptr = bracemap[codeptr]
-        if command == "]" and cells[cellptr] != 0:
-            codeptr = bracemap[codeptr]
-        if command == ".":
-            output += chr(cells[cellptr])
-        if command == ",":
-            try:
-                cells[cellptr] = ord(input_string[input_index])
-            except IndexError:
-                # Tried to read past the last char of input, get 0
+    cells, codeptr, cellptr, input_index = bytearray(tape_size), 0, 0, 0
+    tape_length = tape_size
+    clamp = pointer_policy == 'clamp'
+    output = bytearray()
+    steps = 0  # How many BF symbols have been executed; idioms count as the symbols they replace
+
+    complete = True
+    mismatch = 0
+    if target is not None:
+        target_codes = char_codes(target)
+        target_length = len(target_codes)
+        output_limit = float('inf') if output_slack is None else target_length + output_slack
+        if mismatch_bound is None:
+            mismatch_bound = float('inf')
+        # Room for the target and the slack, plus the char that goes over it; printing writes into it by index, and
+        #   only grows it past that without an output_slack
+        output = bytearray(target_length if output_slack is None else output_limit + 1)
+        output_capacity = len(output)
+        output_length = 0
+
+    time_begin = time.time()  # We count from here for the timeout
+    if timeout_unit == 'ms':
+        time_target = time_begin + (timeout / 1000)  # Convert from milliseconds
+        step_limit = float('inf')
+    else:
+        time_target = None
+        step_limit = timeout
+
+    while codeptr < op_count:
+        op = ops[codeptr]
+
+        if op == OP_ADD:
+            cells[cellptr] = (cells[cellptr] + args[codeptr]) & 255
+            steps += weights[codeptr]
+        elif op == OP_MOVE:
+            cellptr += args[codeptr]
+            steps += weights[codeptr]
+            if cellptr < 0 or cellptr >= tape_length:
+                if clamp:
+                    if cellptr < 0:
+                        cellptr = 0
+                    else:
+                        tape_length = grow_tape(cells, cellptr)
+                elif pointer_policy == 'wrap':
+                    cellptr %= tape_length
+                else:
+                    raise TapeBoundsException("The cell pointer left the tape of {} cells at op {}.".format(tape_length,
+                                                                                                          codeptr))
+        elif op == OP_CLOSE:
+            steps += 1
+            if cells[cellptr]:
+                codeptr = args[codeptr]
+                # Only loops can run forever, so the budget is only checked when jumping backwards. Using an exception
+                #   avoids the problem that Igliu had:
+                #   https://igliu.com/program-that-writes-brainfuck/
+                #   in which his code would loop infinitely to produce a 0 return value (his abort value)
+                if steps > step_limit or (time_target is not None and time.time() > time_target):
+                    raise timeout_exception(timeout, timeout_unit, steps)
+        elif op == OP_OPEN:
+            steps += 1
+            if not cells[cellptr]:
+                codeptr = args[codeptr]
+        elif op == OP_OUTPUT:
+            steps += 1
+            if target is not None:
+                # Score the char now, so hopeless programs can be stopped before they finish
+                if output_length < target_length:
+                    mismatch += abs(target_codes[output_length] - cells[cellptr])
+                else:
+                    mismatch += cells[cellptr]
+                if output_length < output_capacity:
+                    output[output_length] = cells[cellptr]
+                else:
+                    output.append(cells[cellptr])
+                output_length += 1
+                if mismatch > mismatch_bound or output_length > output_limit:
+                    complete = False
+                    break
+            else:
+                output.append(cells[cellptr])
+        elif op == OP_CLEAR:
+            count = cells[cellptr]
+            if count and args[codeptr] == 1:
+                count = 256 - count
+            # The [ once, then the body and the ] on every iteration
+            steps += 1 + count * (weights[codeptr] + 1)
+            cells[cellptr] = 0
+            if steps > step_limit:
+                raise timeout_exception(timeout, timeout_unit, steps)
+        elif op == OP_INPUT:
+            cells[cellptr] = input_codes[input_index]
+            if input_index < input_length:
+                input_index += 1
+            steps += 1
+        else:  # OP_MULTIPLY
+            loop = program.loops[codeptr]
+            count = cells[cellptr]
+            steps += 1
+            if not count:
+                codeptr = loop.close
+            elif cellptr + loop.min_offset >= 0 and (clamp or cellptr + loop.max_offset < tape_length):
+                # The body never hits an edge of the tape, so it can be applied all at once
+                if loop.step == 1:
+                    count = 256 - count
+                if cellptr + loop.max_offset >= tape_length:
+                    tape_length = grow_tape(cells, cellptr + loop.max_offset)
+                for offset, delta in loop.changes:
+                    cells[cellptr + offset] = (cells[cellptr + offset] + delta * count) & 255
                 cells[cellptr] = 0
-            input_index += 1
+                # The body and the ] on every iteration
+                steps += count * (weights[codeptr] + 1)
+                codeptr = loop.close
+                if steps > step_limit:
+                    raise timeout_exception(timeout, timeout_unit, steps)
+            # Otherwise, fall through into the body like a plain [, and let the moves apply the pointer policy
 
         codeptr += 1
 
+    if steps > step_limit:
+        # Loop-free code can also run over a step budget
+        raise timeout_exception(timeout, timeout_unit, steps)
+
+    if target is not None:
+        # Drop the room that was not printed into
+        del output[output_length:]
+    if bytes_mode:
+        output = bytes(output)
+    else:
+        output = output.decode('latin-1')  # Maps each byte to the char with that code point
+    elapsed = time.time() - time_begin if timeout_unit == 'ms' else steps
+    if target is not None:
+        return ScoredRun(output, elapsed, mismatch, complete, steps)
     if return_time:
-        return (output, current_time - time_begin)
+        return (output, elapsed)
     else:
         return output
 
+
+def evaluate(code, input_string, timeout = 5, return_time=False, timeout_unit='ms', target=None, output_slack=None,
+             mismatch_bound=None, tape_size=TAPE_SIZE, pointer_policy='clamp'):
+    """
+    Run a BF program
+    :param code: The BF program, as a string or a CompiledProgram from compile_program
+    :param input_string: The input for the program, as a str, or as bytes for bytes mode (see BYTES_TYPES)
+    :param timeout: How long the program may run for, in timeout_unit
+    :param return_time: If True, return a tuple (output, elapsed), where elapsed is in seconds for 'ms' and in steps
+            for 'steps'
+    :param timeout_unit: 'ms' for a wall-clock timeout, or 'steps' for a budget of executed BF symbols
+    :param target: If given, score the output against this as it is printed and return a ScoredRun
+    :param output_slack: With a target, stop once the output is more than this many chars longer than the target
+    :param mismatch_bound: With a target, stop once the mismatch is more than this
+    :param tape_size: How many cells to allocate up front; with the 'wrap' and 'error' policies, the size of the tape
+    :param pointer_policy: 'clamp', 'wrap' or 'error'; see POINTER_POLICIES
+    :return: The output as a string, or a ScoredRun if target is given
+    """
+    if not isinstance(code, CompiledProgram):
+        code = compile_program(code)
+    return execute(code, input_string, timeout, return_time, timeout_unit, target, output_slack, mismatch_bound,
+                   tape_size, pointer_policy)
@@ -0,0 +1,198 @@
+# Island-model evolution: several populations evolve side by side in their own processes, and every few generations
+#   each one sends copies of its best programs to its neighbours. Good programs spread between islands without any one
+#   population taking over, and all islands stop as soon as one of them finds a program with a cost of zero.
+
+import multiprocessing
+import queue
+import random
+from evolve_bf import evolve, evaluation
+
+TOPOLOGIES = ('ring', 'full')
+ISLAND_POLL_INTERVAL = 1  # Seconds between checks that islands which have not reported back are still running
+
+
+class IslandStopped(Exception):
+    """
+    Raised inside an island when another island has already won
+    """
+    pass
+
+
+def get_neighbours(island, islands, topology='ring'):
+    """
+    Find which islands an island sends its migrants to
+    :param island: The island's index
+    :param islands: How many islands there are
+    :param topology: 'ring' sends to the next island along, 'full' to every other island
+    :return: A list of island indices
+    """
+    if topology == 'ring':
+        return [(island + 1) % islands] if islands > 1 else []
+    elif topology == 'full':
+        return [other for other in range(islands) if other != island]
+    raise ValueError("topology must be one of {}, not {!r}.".format(TOPOLOGIES, topology))
+
+
+def _run_island(island, inputs, targets, options, seed, inboxes, neighbours, migration_interval, migration_size,
+                stop, results):
+    """
+    Evolve one island's population, swapping programs through the inboxes. When it is done, put
+    (island, report, error, generations) on results; report is None if it was stopped or failed.
+    """
+    random.seed(seed)
+    generations = 0
+
+    def migrate(generation, survivors):
+        nonlocal generations
+        generations = generation
+        if stop.is_set():
+            raise IslandStopped()
+        if not neighbours or generation % migration_interval != 0 or not survivors:
+            return survivors
+        for neighbour in neighbours:
+            inboxes[neighbour].put(survivors[:migration_size])
+        immigrants = []
+        try:
+            # Take whatever has arrived; islands never wait on each other
+            while True:
+                immigrants += inboxes[island].get_nowait()
+        except queue.Empty:
+            pass
+        # Immigrants replace the weakest survivors
+        immigrants = immigrants[:len(survivors) // 2]
+        return survivors[:len(survivors) - len(immigrants)] + immigrants
+
+    # Migrants left unread when the run ends must not hold this process open
+    for inbox in inboxes:
+        inbox.cancel_join_thread()
+    try:
+        evaluator = evaluation.make_evaluator(inputs, targets, options.evaluation_backend, options.evaluation_workers,
+                                              options.evaluation_chunk_size, options.fitness_cache_size)
+        try:
+            report = evolve._evolve(inputs, targets, options, evaluator, migrate=migrate)
+        finally:
+            evaluator.close()
+    except IslandStopped:
+        results.put((island, None, None, generations))
+        return
+    except Exception as exception:
+        results.put((island, None, repr(exception), generations))
+        return
+    results.put((island, report, None, report.generations if report is not None else generations))
+
+
+def _run_islands(inputs, targets, options, islands, seed, topology, migration_interval, migration_size):
+    """
+    Run islands until one finds a program with a cost of zero, or all of them have finished
+    :param topology: A topology name, or None for no migration
+    :return: A tuple (winning island or None, its report or None, generations run by each island, or None for islands
+            that did not report back)
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    inboxes = [multiprocessing.Queue() for _ in range(islands)]
+    workers = [multiprocessing.Process(target=_run_island,
+                                       args=(island, inputs, targets, options, seed + island, inboxes,
+                                             get_neighbours(island, islands, topology) if topology else [],
+                                             migration_interval, migration_size, stop, results))
+               for island in range(islands)]
+    for worker in workers:
+        worker.start()
+
+    generation_counts = [None] * islands
+    winner, winning_report, error = None, None, None
+    try:
+        reported = 0
+        while reported < islands and winner is None and error is None:
+            try:
+                island, report, island_error, generations = results.get(timeout=ISLAND_POLL_INTERVAL)
+            except queue.Empty:
+                # An island killed from outside, say by the OOM killer, never reports back. Its result would already
+                #   be on the queue if it had sent one before exiting.
+                lost = [island for island in range(islands)
+                        if generation_counts[island] is None and not workers[island].is_alive()]
+                if lost and results.empty():
+                    error = "Island {} exited with code {} without reporting back.".format(
+                        lost[0], workers[lost[0]].exitcode)
+                continue
+            reported += 1
+            generation_counts[island] = generations
+            if island_error is not None:
+                error = "Island {} failed: {}".format(island, island_error)
+            elif report is not None and report.cost == 0:
+                winner, winning_report = island, report
+        # Every island checks stop once a generation, so the rest report back quickly
+        stop.set()
+        polls = 0
+        while reported < islands:
+            try:
+                island, _, _, generations = results.get(timeout=ISLAND_POLL_INTERVAL)
+            except queue.Empty:
+                polls += 1
+                if polls * ISLAND_POLL_INTERVAL >= 5 or not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            reported += 1
+            generation_counts[island] = generations
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(5)
+            if worker.is_alive():
+                # Anything still stuck is terminated
+                worker.terminate()
+                worker.join()
+    if error is not None:
+        raise RuntimeError(error)
+    return (winner, winning_report, generation_counts)
+
+
+def island_evolve(inputs, targets, options=evolve.default_evolve_options, islands=4, migration_interval=10,
+                  migration_size=5, topology='ring', seed=None):
+    """
+    Evolve several populations in parallel, migrating programs between them
+    :param inputs: Inputs to the evolving programs
+    :param targets: Outputs expected from the evolving programs
+    :param options: EvolveOptions for every island. The 'process' evaluation_backend is not available, as each island
+            is already a process, and nor is a checkpoint_path, as the islands would share it; population_size is per
+            island.
+    :param islands: How many populations to evolve, each in its own process
+    :param migration_interval: Migrate every this many generations
+    :param migration_size: How many of its best programs an island sends to each neighbour
+    :param topology: 'ring' or 'full'; see get_neighbours
+    :param seed: If not None, island i seeds its RNG with seed + i
+    :return: The ProgramReport from the first island to find a program with a cost of zero, or None if every island
+            finished without one
+    """
+    if options.evaluation_backend == 'process':
+        raise ValueError("Islands run in worker processes already; use the 'serial' or 'numpy' evaluation_backend.")
+    if options.checkpoint_path is not None:
+        raise ValueError("Every island would write the same checkpoint; set checkpoint_path to None.")
+    get_neighbours(0, islands, topology)  # Check the topology before starting anything
+    island, report, _ = _run_islands(inputs, targets, options, islands, seed, topology, migration_interval,
+                                     migration_size)
+    if options.verbose and island is not None:
+        print("Island {} succeeded.".format(island))
+    return report
+
+
+def race_evolve(inputs, targets, options=evolve.default_evolve_options, attempts=4, seed=None):
+    """
+    Start several independent evolutions at once and keep the first to succeed; the rest are stopped
+    :param inputs: Inputs to the evolving programs
+    :param targets: Outputs expected from the evolving programs
+    :param options: EvolveOptions for every attempt; as with island_evolve, not the 'process' evaluation_backend or a
+            checkpoint_path
+    :param attempts: How many evolutions to run, each in its own process
+    :param seed: If not None, attempt i seeds its RNG with seed + i
+    :return: A tuple (the winning attempt's index or None, its ProgramReport or None, a list of how many generations
+            each attempt ran for)
+    """
+    if options.evaluation_backend == 'process':
+        raise ValueError("Attempts run in worker processes already; use the 'serial' or 'numpy' evaluation_backend.")
+    if options.checkpoint_path is not None:
+        raise ValueError("Every attempt would write the same checkpoint; set checkpoint_path to None.")
+    return _run_islands(inputs, targets, options, attempts, seed, None, 1, 0)
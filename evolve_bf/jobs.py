@@ -0,0 +1,283 @@
+# An asyncio job runner for many evolutions on one host.
+# Each job is a spec (inputs, targets, EvolveOptions). Submitting one returns a Job right away, which can be awaited for
+#   its ProgramReport or iterated for its GenerationMetrics as they arrive. Jobs wait in a priority queue and run on a
+#   shared pool of worker processes, at most concurrency at a time, and can be cancelled whether waiting or running.
+# Solved reports are kept in a ResultStore on disk, keyed by a hash of the spec, so a spec that has been solved before
+#   is answered from the store without evolving it again.
+
+import asyncio
+import gzip
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from evolve_bf import evolve
+
+RESULT_COMPRESSION = 6  # gzip level for stored reports
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a worker to stop the evolution of a cancelled job
+    """
+    pass
+
+
+def spec_key(inputs, targets, options=evolve.default_evolve_options):
+    """
+    Hash a job spec, leaving out options that change how a run is watched or where it is evaluated rather than what it
+    finds
+    :param inputs: Inputs to the evolving program
+    :param targets: Outputs expected from the evolving program
+    :param options: An EvolveOptions
+    :return: A hex digest
+    """
+    options = options._replace(verbose=False, metrics_hook=None, checkpoint_path=None, checkpoint_interval=None,
+                               evaluation_backend=None, evaluation_workers=None, evaluation_chunk_size=None,
+                               fitness_cache_size=None)
+    return hashlib.sha256(repr((list(inputs), list(targets), options)).encode('utf-8')).hexdigest()
+
+
+class ResultStore(object):
+    """
+    Solved ProgramReports, one gzipped pickle per spec key in a directory
+    """
+    def __init__(self, directory):
+        """
+        :param directory: Where to keep the reports; created if it does not exist. Only use a directory you wrote;
+                the reports are pickles.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pickle.gz")
+
+    def get(self, key):
+        """
+        :param key: A spec_key
+        :return: The stored ProgramReport, or None
+        """
+        try:
+            with gzip.open(self.path(key), 'rb') as result_file:
+                return pickle.load(result_file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, report):
+        """
+        Store a report atomically, replacing any already stored under key
+        :param key: A spec_key
+        :param report: A ProgramReport
+        """
+        temporary_path = self.path(key) + ".tmp"
+        with gzip.open(temporary_path, 'wb', compresslevel=RESULT_COMPRESSION) as result_file:
+            pickle.dump(report, result_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.path(key))
+
+
+def _run_job(job_id, inputs, targets, options, attempts, seed, stop, progress):
+    """
+    Evolve one job in a worker process, sending (job_id, GenerationMetrics) to progress every generation
+    :return: The first ProgramReport with a cost of zero, else the cheapest of the attempts; None if cancelled or no
+            attempt evaluated a generation
+    """
+    def forward(record):
+        if stop.is_set():
+            raise JobCancelled()
+        progress.put((job_id, record))
+
+    options = options._replace(verbose=False, metrics_hook=forward)
+    best = None
+    for attempt in range(attempts):
+        if seed is not None:
+            random.seed(seed + attempt)
+        try:
+            report = evolve.evolve_bf_program(inputs, targets, options)
+        except JobCancelled:
+            return None
+        if report is not None and (best is None or report.cost < best.cost):
+            best = report
+        if best is not None and best.cost == 0:
+            break
+    return best
+
+
+class Job(object):
+    """
+    A submitted spec. Await it for its ProgramReport (None if no generation was evaluated).
+    """
+    def __init__(self, job_id, key, inputs, targets, options, priority, attempts, seed):
+        self.job_id = job_id
+        self.key = key
+        self.inputs = inputs
+        self.targets = targets
+        self.options = options
+        self.priority = priority
+        self.attempts = attempts
+        self.seed = seed
+        self.from_store = False  # Whether the report came from the ResultStore
+        self.future = asyncio.get_running_loop().create_future()
+        self._stop = None  # A manager Event, set to stop the worker once the job is running
+        self._progress = asyncio.Queue()
+
+    def __await__(self):
+        return self.future.__await__()
+
+    def done(self):
+        return self.future.done()
+
+    def cancel(self):
+        """
+        Cancel the job. A waiting job never starts; a running one stops at the end of its current generation.
+        """
+        if self._stop is not None:
+            self._stop.set()
+        self.future.cancel()
+
+    async def progress(self):
+        """
+        Yield a GenerationMetrics for every generation evaluated, ending when the job does. Records are kept until they
+        are read, and can only be read once.
+        """
+        while True:
+            record = await self._progress.get()
+            if record is None:
+                return
+            yield record
+
+
+class JobRunner(object):
+    """
+    Run jobs on a shared pool of worker processes; use as an async context manager, or call start and close
+    """
+    def __init__(self, concurrency=None, store=None):
+        """
+        :param concurrency: How many jobs to run at once, each in its own process; None means one per CPU
+        :param store: A ResultStore, or a directory to keep one in; None keeps no results
+        """
+        self.concurrency = concurrency or multiprocessing.cpu_count()
+        self.store = ResultStore(store) if isinstance(store, str) else store
+        self._job_ids = itertools.count()
+        self._jobs = {}  # job_id -> Job, until its progress stream has ended
+        self._queue = None
+        self._consumers = []
+        self._manager = None
+        self._pool = None
+        self._progress = None
+        self._drainer = None
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.Queue()
+        self._pool = ProcessPoolExecutor(self.concurrency)
+        # Workers report progress through a manager queue, which a thread hands over to the event loop
+        self._drainer = threading.Thread(target=self._drain, daemon=True)
+        self._drainer.start()
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    async def close(self):
+        """
+        Cancel every unfinished job and shut the pool down
+        """
+        for job in list(self._jobs.values()):
+            job.cancel()
+        for _ in self._consumers:
+            self._queue.put_nowait((float('inf'), next(self._job_ids), None))
+        await asyncio.gather(*self._consumers)
+        self._progress.put((None, None))
+        await self._loop.run_in_executor(None, self._drainer.join)
+        await self._loop.run_in_executor(None, self._pool.shutdown)
+        self._manager.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def submit(self, inputs, targets, options=evolve.default_evolve_options, priority=0, attempts=1, seed=None):
+        """
+        Queue a job
+        :param inputs: Inputs to the evolving program
+        :param targets: Outputs expected from the evolving program
+        :param options: EvolveOptions for the evolution; its metrics_hook is replaced by the job's progress stream, and
+                verbose is ignored. Set a generation, time or evaluation budget, or a job that cannot be solved runs
+                until cancelled. Jobs cannot have a checkpoint_path, as jobs running at once would share it.
+        :param priority: Jobs with a lower priority start first; equal priorities start in the order submitted
+        :param attempts: How many times to evolve before giving up, as supervised_evolve's retry
+        :param seed: If not None, attempt i seeds its RNG with seed + i
+        :return: A Job
+        """
+        if options.checkpoint_path is not None:
+            raise ValueError("Jobs running at once would write the same checkpoint; set checkpoint_path to None.")
+        # The hook need not pickle, and is replaced in the worker anyway
+        options = options._replace(metrics_hook=None, verbose=False)
+        key = spec_key(inputs, targets, options)
+        job = Job(next(self._job_ids), key, inputs, targets, options, priority, max(1, attempts), seed)
+        self._jobs[job.job_id] = job
+        report = self.store.get(key) if self.store is not None else None
+        if report is not None:
+            self._finish(job, report, from_store=True)
+            self._deliver(job.job_id, None)
+        else:
+            self._queue.put_nowait((priority, job.job_id, job))
+        return job
+
+    def _finish(self, job, report, from_store=False):
+        if not job.future.done():
+            job.from_store = from_store
+            job.future.set_result(report)
+
+    def _deliver(self, job_id, record):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job._progress.put_nowait(record)
+        if record is None:
+            del self._jobs[job_id]
+
+    def _drain(self):
+        while True:
+            job_id, record = self._progress.get()
+            if job_id is None:
+                return
+            self._loop.call_soon_threadsafe(self._deliver, job_id, record)
+
+    async def _consume(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job is None:
+                return
+            if job.done():
+                # Cancelled while waiting
+                self._deliver(job.job_id, None)
+                continue
+            # An identical spec may have been solved while this one waited
+            report = self.store.get(job.key) if self.store is not None else None
+            if report is not None:
+                self._finish(job, report, from_store=True)
+                self._deliver(job.job_id, None)
+                continue
+            job._stop = self._manager.Event()
+            try:
+                report = await self._loop.run_in_executor(self._pool, _run_job, job.job_id, job.inputs, job.targets,
+                                                          job.options, job.attempts, job.seed, job._stop,
+                                                          self._progress)
+            except Exception as exception:
+                if not job.done():
+                    job.future.set_exception(exception)
+            else:
+                if report is not None and report.cost == 0 and self.store is not None:
+                    self.store.put(job.key, report)
+                self._finish(job, report)
+            # Sent through the manager queue, so the stream only ends after the worker's last record
+            self._progress.put((job.job_id, None))
@@ -0,0 +1,44 @@
+# Per-generation metrics for evolve_bf.
+# Set EvolveOptions.metrics_hook to any callable and it is passed a GenerationMetrics after every generation, or use a
+#   JSONLSink to append them to a file, one JSON object per line.
+
+import json
+from collections import namedtuple
+from evolve_bf import cost
+
+# generation: the generation number, from 0
+# population_size: how many programs were evaluated
+# best_cost: the lowest cost in the generation; cost.OVER_BOUND if every program costed was abandoned, or None if none was
+# syntax_errors, timeouts, tape_errors: inviable programs in the population, by cause (see cost.STATS_KEYS); programs
+#   whose cost came from the fitness cache count too
+# abandoned: programs dropped for costing more than the previous cull boundary
+# steps: BF symbols executed while evaluating; cached costs add nothing
+# mean_program_length: the mean length of the evaluated programs, to watch for bloat
+# cache_hits, cache_misses: fitness cache lookups this generation, or None without a cache
+# *_time: seconds spent on evaluation, sorting, culling, mutation, crossover and generating replacement programs.
+#   The generation that finds a winner stops after evaluation, so its other times are 0.
+GenerationMetrics = namedtuple("GenerationMetrics", ['generation', 'population_size', 'best_cost', 'syntax_errors',
+                                                     'timeouts', 'tape_errors', 'abandoned', 'steps',
+                                                     'mean_program_length', 'cache_hits', 'cache_misses',
+                                                     'evaluation_time', 'sort_time', 'cull_time', 'mutation_time',
+                                                     'crossover_time', 'generation_time'])
+
+
+class JSONLSink(object):
+    """
+    A metrics_hook that appends each GenerationMetrics to a file as a line of strict JSON; an OVER_BOUND best_cost is
+    written as null
+    """
+    def __init__(self, path):
+        """
+        :param path: The file to append to; it is opened for each record, so it can be read while evolution runs
+        """
+        self.path = path
+
+    def __call__(self, metrics):
+        with open(self.path, 'a') as sink_file:
+            record = metrics._asdict()
+            if record['best_cost'] == cost.OVER_BOUND:
+                # JSON has no infinity
+                record['best_cost'] = None
+            sink_file.write(json.dumps(record, allow_nan=False) + "\n")
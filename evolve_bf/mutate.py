@@ -1,10 +1,12 @@
-from random import choice, randint
+from functools import lru_cache
+from itertools import accumulate
+from random import choice, choices, randint, randrange
 from evolve_bf import common
 from collections import namedtuple
 
-MutateOptions = namedtuple("MutationOptions", ['likelihood_of_inplace', 'likelihood_of_addition',
-                                               'likelihood_of_deletion', 'likelihood_of_none',
-                                               'looping_chance', 'max_symbols_per_addition'])
+MutateOptions = namedtuple("MutateOptions", ['likelihood_of_inplace', 'likelihood_of_addition',
+                                             'likelihood_of_deletion', 'likelihood_of_none',
+                                             'looping_chance', 'max_symbols_per_addition'])
 
 default_mutate_options = MutateOptions(likelihood_of_inplace = 100, likelihood_of_addition= 30,
                                        likelihood_of_deletion= 40, likelihood_of_none = 1, looping_chance = 20,
@@ -17,6 +19,114 @@ default_mutate_options = MutateOptions(likelihood_of_inplace = 100, likelihood_o
 # looping_chance: How likley it is to insert a loop. Percent.
 # max_symbols_per_addition: Add from 1 to this many symbols of each type per addition
 
+# The mutation types, in the order of their likelihoods in MutateOptions
+MUTATION_TYPES = ('inplace', 'addition', 'deletion', 'none')
+
+
+class MutationEngine(object):
+    """
+    Mutates programs with tables built once from a MutateOptions, rather than rebuilding weighted lists on every call
+    """
+    def __init__(self, options=default_mutate_options):
+        """
+        :param options: A MutateOptions with options for the mutations
+        """
+        self.options = options
+        # Cumulative weights for random.choices, which picks with one random() and a bisect
+        self.mutation_cum_weights = list(accumulate([options.likelihood_of_inplace, options.likelihood_of_addition,
+                                                     options.likelihood_of_deletion, options.likelihood_of_none]))
+        self.looping_chance = options.looping_chance
+
+    def add_loop(self):
+        # A looping_chance percent chance, as drawing from [True] * looping_chance + [False] * (100 - looping_chance)
+        return randrange(100) < self.looping_chance
+
+    def mutate(self, program, mutation_type=None):
+        """
+        Mutate a program
+        :param program: The program to mutate
+        :param mutation_type: One of MUTATION_TYPES, or None to pick one by the options' likelihoods
+        :return: A new program
+        """
+        if mutation_type is None:
+            mutation_type = choices(MUTATION_TYPES, cum_weights=self.mutation_cum_weights)[0]
+
+        if len(program) <= 1:
+            # The mutation logic does not work on one-length programs
+            return program + choice(common.valid_commands_no_loops)
+
+        if mutation_type == 'inplace':
+            index_to_mutate = randint(1, len(program))
+            # Replace a single symbol
+            if program[index_to_mutate - 1] in ['[', ']']:  # -1 here because indices are from 0 not from 1
+                # Brackets are left alone; deletion is what takes loops apart
+                pass
+            elif self.add_loop():
+                program = wrap_in_loop(program, index_to_mutate)
+            else:
+                program = program[:(index_to_mutate - 1)] + choice(common.valid_commands_no_loops) + \
+                          program[index_to_mutate:]
+        elif mutation_type == 'addition':
+            index_to_mutate = randint(1, len(program))
+            # Insert a symbol at index_to_mutate
+            if self.add_loop():
+                program = wrap_in_loop(program, index_to_mutate)
+            else:
+                addnum = randint(1, self.options.max_symbols_per_addition + 1)
+                addition = "" + choice(common.valid_commands_no_loops_weighted) * addnum
+                program = program[:index_to_mutate] + addition + program[index_to_mutate:]
+        elif mutation_type == 'deletion':
+            index_to_mutate = randint(1, len(program))
+            matches = common.matching_brackets(program)
+            if index_to_mutate - 1 in matches:  # -1 here because indices are from 0 not from 1
+                # If the symbol is part of a loop, delete its partner too, so the brackets stay balanced. Either the
+                #   loop is unwrapped, keeping its body, or the whole loop goes.
+                open_index, close_index = sorted((index_to_mutate - 1, matches[index_to_mutate - 1]))
+                if randint(0, 1):
+                    program = program[:open_index] + program[open_index + 1:close_index] + program[close_index + 1:]
+                else:
+                    program = program[:open_index] + program[close_index + 1:]
+            else:
+                # Delete a single symbol
+                program = program[:(index_to_mutate - 1)] + program[index_to_mutate:]
+        # 'none' is perfect transcription
+        return program
+
+    def mutate_population(self, programs):
+        """
+        Mutate every program in a population, drawing all of their mutation types at once
+        :param programs: A list of programs
+        :return: A list of new programs, in the same order
+        """
+        mutation_types = choices(MUTATION_TYPES, cum_weights=self.mutation_cum_weights, k=len(programs))
+        return [self.mutate(program, mutation_type) for program, mutation_type in zip(programs, mutation_types)]
+
+
+def wrap_in_loop(program, index):
+    """
+    Put a loop around part of a program, starting at index; brackets stay balanced whatever the part holds
+    :param program: The program
+    :param index: Where to put the [
+    :return: The new program, or the old one if there is not enough room after index
+    """
+    if index < len(program) - 2:
+        # We have enough room
+        skip_index = index + randint(1, len(program) - index)
+        return program[:index] + '[' + program[index:skip_index] + ']' + program[skip_index:]
+    # Not enough room
+    return program
+
+
+@lru_cache(maxsize=16)
+def get_mutation_engine(options=default_mutate_options):
+    """
+    Get the MutationEngine for a MutateOptions, building it the first time
+    :param options: A MutateOptions
+    :return: A MutationEngine
+    """
+    return MutationEngine(options)
+
+
 def mutation_function(program, options=default_mutate_options):
     """
     Mutate program based on liklihood inputs
@@ -24,76 +134,4 @@ def mutation_function(program, options=default_mutate_options):
     :param options: A MutateOptions with options for the function
     :return: A new program
     """
-    choice_list = ['inplace'] * options.likelihood_of_inplace + \
-        ['addition'] * options.likelihood_of_addition + \
-        ['deletion'] * options.likelihood_of_deletion + \
-        ['none'] * options.likelihood_of_none
-    mutation_type = choice(choice_list)  # Pick a mutation type
-
-    if len(program) <= 1:
-        # The mutation logic does not work on one-length programs
-        return program + choice(common.valid_commands_no_loops)
-
-    if mutation_type == 'inplace':
-        index_to_mutate = randint(1, len(program))
-        # Replace a single symbol
-        # TODO: Implement adding loops by this mechanism
-        # Implementaion note: when inserting a [, insert a ] at (pos_of_[) + (random_int_less_than_length)
-        if program[index_to_mutate - 1] in ['[', ']']:  # -1 here because indices are from 0 not from 1
-            # If the symbol is part of a loop, figure out how to replace it safely.
-            # TODO: MAKE THIS WORK!
-            # For now we just chicken out
-            pass
-        else:
-            do_add_loop = choice([True] * options.looping_chance + [False] * (100-options.looping_chance))
-            if do_add_loop:
-                if index_to_mutate < len(program) - 2:
-                    # We have enough room
-                    skip_index = index_to_mutate + randint(1, len(program) - index_to_mutate)
-                    program = program[:index_to_mutate] + '[' + program[index_to_mutate:skip_index] + ']' + \
-                              program[skip_index:]
-                else:
-                    # Not enough room
-                    pass
-            else:
-                program = program[:(index_to_mutate - 1)] + choice(common.valid_commands_no_loops) + \
-                          program[index_to_mutate:]
-                pass
-    if mutation_type == 'addition':
-        index_to_mutate = randint(1, len(program))
-        # Insert a symbol at index_to_mutate
-        do_add_loop = choice([True] * options.looping_chance + [False] * (100-options.looping_chance))
-        if do_add_loop:
-            if index_to_mutate < len(program) - 2:
-                # We have enough room
-                skip_index = index_to_mutate + randint(1, len(program) - index_to_mutate)
-                program = program[:index_to_mutate] + '[' + program[index_to_mutate:skip_index] + ']' + \
-                          program[skip_index:]
-            else:
-                # Not enough room
-                pass
-        else:
-            addnum = randint(1, options.max_symbols_per_addition + 1)
-            addition = "" + choice(common.valid_commands_no_loops_weighted) * addnum
-            program = program[:index_to_mutate] + addition + \
-                      program[index_to_mutate:]
-        pass
-    if mutation_type == 'deletion':
-        index_to_mutate = randint(1, len(program))
-        if program[index_to_mutate - 1] in ['[', ']']:  # -1 here because indices are from 0 not from 1
-            # If the symbol is part of a loop, count up to the next one and delete that too
-            next_bracket_position = index_to_mutate - 1
-            for char in program[index_to_mutate:]:
-                next_bracket_position += 1
-                if char == ']':
-                    break
-            program = program[:(index_to_mutate - 1)] + program[index_to_mutate:]
-            program = program[:(next_bracket_position - 1)] + program[next_bracket_position:]
-        else:
-            # Delete a single symbol
-            program = program[:(index_to_mutate - 1)] + program[index_to_mutate:]
-            pass
-    if mutation_type == 'none':
-        # No mutation
-        pass
-    return program
\ No newline at end of file
+    return get_mutation_engine(options).mutate(program)
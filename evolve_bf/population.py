@@ -0,0 +1,161 @@
+# A compact container for a population of BF programs.
+# All programs are kept in one flat bytearray, one uint8 per BF symbol, with an array of offsets marking where each
+#   starts. A population of n programs is then two objects rather than n strs, and selection copies runs of bytes
+#   straight from one buffer into the next. A Population reads like a sequence of strs, so it can be handed to
+#   anything that takes a list of programs.
+# Mutation and crossover are done by the str operators in mutate and cross; the batch methods here unpack the programs,
+#   apply them, and pack the children, so there is one implementation of each operator.
+
+from array import array
+from itertools import accumulate
+from random import choice, randint, shuffle
+from evolve_bf import common, cross
+
+OPEN, CLOSE = ord('['), ord(']')
+# The symbol tables of common, as codes; drawing from a list of the same length makes the same draw
+_NO_END_LOOP_CODES = [ord(command) for command in common.valid_commands_no_end_loop]
+_NO_LOOP_CODES = [ord(command) for command in common.valid_commands_no_loops]
+
+
+class Population(object):
+    """
+    Programs stored as a flat buffer of BF symbols plus offsets
+    """
+    def __init__(self, buffer=None, offsets=None):
+        """
+        :param buffer: A bytearray of the programs' symbols, one after another
+        :param offsets: An array('q') of len(programs) + 1 offsets into buffer; program i is buffer[offsets[i]:offsets[i+1]]
+        """
+        self.buffer = buffer if buffer is not None else bytearray()
+        self.offsets = offsets if offsets is not None else array('q', [0])
+
+    @classmethod
+    def from_programs(cls, programs):
+        """
+        Pack a list of programs
+        :param programs: An iterable of BF programs as strs
+        :return: A Population
+        """
+        programs = list(programs)
+        return cls(bytearray("".join(programs).encode('ascii')),
+                   array('q', accumulate(map(len, programs), initial=0)))
+
+    @classmethod
+    def generate(cls, individuals, length=10):
+        """
+        Generate random programs straight into the buffer; the same programs, from the same random draws, as
+        evolve.generate_population
+        :param individuals: How many programs to generate
+        :param length: How long each program is
+        :return: A Population
+        """
+        population = cls()
+        buffer = population.buffer
+        for _ in range(individuals):
+            program_index = 0
+            while program_index < length:
+                # Randomly choose a symbol
+                next_command = choice(_NO_END_LOOP_CODES)
+                if next_command == OPEN:  # We're starting a new loop
+                    if length - program_index <= 3:
+                        # No room for a loop; the symbol drawn instead is not used
+                        choice(_NO_LOOP_CODES)
+                    else:
+                        buffer.append(OPEN)
+                        inside_loop_length = randint(1, length - (program_index + 1))  # +1 to leave room for ]
+                        buffer.extend([choice(_NO_LOOP_CODES) for _ in range(inside_loop_length)])
+                        # Close off the loop
+                        buffer.append(CLOSE)
+                        program_index += inside_loop_length + 1  # The 1 is for the closing ']'
+                else:
+                    buffer.append(next_command)
+                program_index += 1
+            population.offsets.append(len(buffer))
+        return population
+
+    def append(self, program):
+        self.buffer.extend(program.encode('ascii'))
+        self.offsets.append(len(self.buffer))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[program_index] for program_index in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Population index out of range.")
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode('ascii')
+
+    def __iter__(self):
+        buffer, offsets = self.buffer, self.offsets
+        for index in range(len(self)):
+            yield buffer[offsets[index]:offsets[index + 1]].decode('ascii')
+
+    def __eq__(self, other):
+        return isinstance(other, Population) and self.buffer == other.buffer and self.offsets == other.offsets
+
+    def programs(self):
+        """
+        :return: The programs as a list of strs, for costing and reporting
+        """
+        text, offsets = self.buffer.decode('ascii'), self.offsets
+        return [text[offsets[index]:offsets[index + 1]] for index in range(len(self))]
+
+    def lengths(self):
+        """
+        :return: A list of the programs' lengths, without unpacking them
+        """
+        offsets = self.offsets
+        return [offsets[index + 1] - offsets[index] for index in range(len(self))]
+
+    def select(self, indices):
+        """
+        Gather programs into a new Population, copying their bytes directly
+        :param indices: Indices of the programs to take, in the order to take them; repeats are allowed
+        :return: A Population
+        """
+        view = memoryview(self.buffer)
+        offsets = self.offsets
+        programs = [view[offsets[index]:offsets[index + 1]] for index in indices]
+        return Population(bytearray().join(programs), array('q', accumulate(map(len, programs), initial=0)))
+
+    def shuffled_order(self):
+        """
+        :return: A list of the programs' indices in a random order, as random.shuffle would put a list of the programs
+        """
+        order = list(range(len(self)))
+        shuffle(order)
+        return order
+
+    def shuffled(self):
+        """
+        :return: A new Population of the same programs in a random order, as random.shuffle would put a list of them
+        """
+        return self.select(self.shuffled_order())
+
+    def mutate(self, engine):
+        """
+        Mutate every program with engine.mutate_population
+        :param engine: A mutate.MutationEngine
+        :return: A new Population, in the same order
+        """
+        return Population.from_programs(engine.mutate_population(self.programs()))
+
+    def cross(self, partners, order=None, partner_order=None):
+        """
+        Cross each program with the program at the same index of partners, with cross.crossing_function
+        :param partners: A Population as long as this one
+        :param order: If not None, the indices of the programs to cross, in order, as if self.select(order) were crossed
+        :param partner_order: The same, for partners
+        :return: A new Population holding both children of each cross, in pairs
+        """
+        programs_a, programs_b = self.programs(), partners.programs()
+        if order is not None:
+            programs_a = [programs_a[index] for index in order]
+        if partner_order is not None:
+            programs_b = [programs_b[index] for index in partner_order]
+        return Population.from_programs(child for program_a, program_b in zip(programs_a, programs_b)
+                                        for child in cross.crossing_function(program_a, program_b))
@@ -0,0 +1,101 @@
+# Selection of the programs that survive each generation's cull.
+# Every scheme works on a list of costs and returns indices into it, so the generation loop never builds or sorts a
+#   record per program. Truncation, the default, only needs the cheapest programs in order, which numpy.argpartition
+#   finds without sorting the whole population; without NumPy, heapq.nsmallest does the same for small cuts.
+
+import heapq
+import random
+from itertools import accumulate
+
+try:
+    import numpy
+except ImportError:  # NumPy only speeds up truncation of large populations
+    numpy = None
+
+SELECTION_SCHEMES = ('truncation', 'tournament', 'rank')
+NUMPY_SELECTION_THRESHOLD = 1000  # Populations at least this large are truncated with numpy.argpartition, if available
+HEAP_SELECTION_RATIO = 10  # Otherwise, cuts of at most 1/this of the population use a heap; a sort is faster for more
+
+
+def best_index(costs):
+    """
+    :param costs: A list of costs
+    :return: The index of the first of the cheapest costs
+    """
+    return min(range(len(costs)), key=costs.__getitem__)
+
+
+def truncate(costs, count):
+    """
+    Take the count cheapest programs without sorting the rest; the same indices, in the same order, as a stable sort of
+    costs cut to count
+    :param costs: A list of costs
+    :param count: How many to take
+    :return: A list of indices, cheapest first, ties in their original order
+    """
+    if count <= 0:
+        return []
+    if count >= len(costs):
+        return sorted(range(len(costs)), key=costs.__getitem__)
+    if numpy is not None and len(costs) >= NUMPY_SELECTION_THRESHOLD:
+        cost_array = numpy.array(costs, dtype=numpy.float64)
+        cutoff = cost_array[numpy.argpartition(cost_array, count - 1)[count - 1]]
+        # Everything cheaper than the cutoff, then the first of the programs tied with it
+        below = numpy.flatnonzero(cost_array < cutoff)
+        tied = numpy.flatnonzero(cost_array == cutoff)[:count - len(below)]
+        chosen = numpy.concatenate((below, tied))
+        return chosen[numpy.argsort(cost_array[chosen], kind='stable')].tolist()
+    if count * HEAP_SELECTION_RATIO <= len(costs):
+        return heapq.nsmallest(count, range(len(costs)), key=costs.__getitem__)
+    return sorted(range(len(costs)), key=costs.__getitem__)[:count]
+
+
+def tournament(costs, count, tournament_size=2):
+    """
+    Hold count tournaments between tournament_size programs picked at random, keeping each winner. Programs can win
+    more than once.
+    :param costs: A list of costs
+    :param count: How many to take
+    :param tournament_size: How many programs enter each tournament; larger tournaments favour cheap programs more
+    :return: A list of indices, cheapest first
+    """
+    if not costs:
+        return []
+    indices = range(len(costs))
+    winners = [min(random.choices(indices, k=tournament_size), key=costs.__getitem__) for _ in range(count)]
+    winners.sort(key=costs.__getitem__)
+    return winners
+
+
+def rank(costs, count):
+    """
+    Pick count programs at random, weighted linearly by rank: the cheapest is n times as likely to be picked as the
+    dearest. Ranking needs a full sort, but no more than that.
+    :param costs: A list of costs
+    :param count: How many to take
+    :return: A list of indices, cheapest first
+    """
+    if not costs:
+        return []
+    ranked = sorted(range(len(costs)), key=costs.__getitem__)
+    cum_weights = list(accumulate(range(len(ranked), 0, -1)))
+    picks = sorted(random.choices(range(len(ranked)), cum_weights=cum_weights, k=count))
+    return [ranked[pick] for pick in picks]
+
+
+def select_survivors(costs, count, scheme='truncation', tournament_size=2):
+    """
+    Choose which programs survive a cull
+    :param costs: A list of costs, one per viable program
+    :param count: How many survivors to choose
+    :param scheme: One of SELECTION_SCHEMES
+    :param tournament_size: For 'tournament'; see tournament
+    :return: A list of indices into costs, cheapest first
+    """
+    if scheme == 'truncation':
+        return truncate(costs, count)
+    elif scheme == 'tournament':
+        return tournament(costs, count, tournament_size)
+    elif scheme == 'rank':
+        return rank(costs, count)
+    raise ValueError("scheme must be one of {}, not {!r}.".format(SELECTION_SCHEMES, scheme))
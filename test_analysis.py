@@ -0,0 +1,28 @@
+from evolve_bf import interpret, analysis
+import unittest
+
+
+class TestAnalysis(unittest.TestCase):
+    def test_static_analysis(self):
+        self.assertFalse(analysis.analyze_program("+[.").balanced)
+        self.assertFalse(analysis.analyze_program("+].[").balanced)
+        self.assertEqual(analysis.analyze_program("+[]").never_halts, 1)
+        self.assertEqual(analysis.analyze_program("+[-]>+[>+<]").never_halts, 6)
+        self.assertEqual(analysis.analyze_program("+[++]").never_halts, 1)
+        # [+] always ends with 8-bit cells, and loops after a , depend on the input
+        self.assertIsNone(analysis.analyze_program("+[+]").never_halts)
+        self.assertIsNone(analysis.analyze_program(",[]").never_halts)
+        self.assertIsNone(analysis.analyze_program("[]+").never_halts)
+        self.assertFalse(analysis.analyze_program("+>+<").has_output)
+
+    def test_simplify(self):
+        self.assertEqual(analysis.simplify_program("+[-][.]>.<<"), "+[-]>.")
+        self.assertEqual(analysis.simplify_program("[+.]++-[>+<-]+-[-].,+"), "+[>+<-].")
+        # <> is kept, as at cell 0 the < does nothing; under 'wrap' it cancels, and under 'error' moves stay
+        self.assertEqual(analysis.simplify_program("+<>.", 'clamp'), "+<>.")
+        self.assertEqual(analysis.simplify_program("+<>.", 'wrap'), "+.")
+        self.assertEqual(analysis.simplify_program("+.><>", 'error'), "+.><>")
+        self.assertEqual(analysis.simplify_program("+[."), "+[.")
+        for program in ("++++++++++[>+++++++>++++++++++>+++>+<<<<-]>++.>+.+++++++..+++.><>++.<<[-]+-[.]", ",[.,]>+<"):
+            self.assertEqual(interpret.evaluate(analysis.simplify_program(program), "cat"),
+                             interpret.evaluate(program, "cat"))
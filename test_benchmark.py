@@ -0,0 +1,17 @@
+from evolve_bf import benchmark
+import json
+import os
+import tempfile
+import unittest
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_main(self):
+        # One quick pass of the whole CLI, so it keeps up with the interfaces it times
+        output_path = os.path.join(tempfile.mkdtemp(), 'results.json')
+        benchmark.main(['--repeat', '1', '--population-size', '20', '--output', output_path])
+        with open(output_path) as output_file:
+            results = json.load(output_file)
+        self.assertEqual(sorted(results['evaluate']), sorted(benchmark.CORPUS))
+        self.assertEqual(results['cost_function']['programs'], 20)
+        self.assertGreater(results['evolve']['gens_per_sec'], 0)
@@ -18,4 +18,54 @@ class TestBFInterpret(unittest.TestCase):
         infinite_loop = "+[]"
         with self.assertRaises(interpret.TimeoutAbortException):
             # This should raise an exception for running too long
-            interpret.evaluate(infinite_loop, "")
\ No newline at end of file
+            interpret.evaluate(infinite_loop, "")
+
+    def test_compile_folds_runs_and_idioms(self):
+        compiled = interpret.compile_program("+++>>[-]<[->+<]")
+        self.assertEqual(compiled.ops[:4], [interpret.OP_ADD, interpret.OP_MOVE, interpret.OP_CLEAR, interpret.OP_MOVE])
+        self.assertEqual(compiled.args[:2], [3, 2])
+        self.assertEqual(compiled.ops[4], interpret.OP_MULTIPLY)
+        self.assertEqual(interpret.evaluate("+++++[->++<]>.", ""), chr(10))
+
+    def test_unbalanced(self):
+        with self.assertRaises(interpret.BFSyntaxException):
+            interpret.compile_program("+[.")
+        with self.assertRaises(interpret.BFSyntaxException):
+            interpret.compile_program("+].")
+
+    def test_step_budget(self):
+        output, steps = interpret.evaluate("++[>+<-]>.", "", timeout=100, return_time=True, timeout_unit='steps')
+        self.assertEqual(output, chr(2))
+        self.assertEqual(steps, 2 + 1 + 2 * 5 + 2)
+        with self.assertRaises(interpret.TimeoutAbortException):
+            interpret.evaluate("+[]", "", timeout=1000, timeout_unit='steps')
+
+    def test_streamed_target(self):
+        run = interpret.evaluate(",[.,]", "abd", target="abc")
+        self.assertEqual(run.output, "abd")
+        self.assertEqual(run.mismatch, 1)
+        self.assertTrue(run.complete)
+        # Stopped one char past len(target) + output_slack, without waiting for the timeout
+        run = interpret.evaluate("+[.]", "", timeout=1000, timeout_unit='steps', target="ab", output_slack=2)
+        self.assertEqual(run.output, chr(1) * 5)
+        self.assertFalse(run.complete)
+        run = interpret.evaluate(",[.,]", "zzzz", target="aaaa", mismatch_bound=30)
+        self.assertEqual(run.output, "zz")
+        self.assertFalse(run.complete)
+        # The output is written into room made for the target, and only what was printed is returned
+        self.assertEqual(interpret.evaluate(",[.,]", "a", target="abc").output, "a")
+        self.assertEqual(interpret.evaluate(",[.,]", "abcde", target="abc").output, "abcde")
+        self.assertEqual(interpret.evaluate(",[.,]", "abcde", target="abc", output_slack=1).output, "abcde")
+
+    def test_bytes_mode(self):
+        self.assertEqual(interpret.evaluate(",[.,]", b"\xffcat"), b"\xffcat")
+        self.assertEqual(interpret.evaluate("+++.", bytearray()), b"\x03")
+        run = interpret.evaluate(",[.,]", b"abd", target=b"abc")
+        self.assertEqual((run.output, run.mismatch), (b"abd", 1))
+
+    def test_pointer_policies(self):
+        # The default tape grows as needed, however small it starts
+        self.assertEqual(interpret.evaluate(">>>>+++.<<<<<<.", "", tape_size=1), chr(3) + chr(0))
+        self.assertEqual(interpret.evaluate("<+++>>.", "", tape_size=2, pointer_policy='wrap'), chr(3))
+        with self.assertRaises(interpret.TapeBoundsException):
+            interpret.evaluate(">>+.", "", tape_size=2, pointer_policy='error')
@@ -0,0 +1,26 @@
+from evolve_bf import interpret, codegen
+import unittest
+
+
+class TestCodegen(unittest.TestCase):
+    def test_codegen(self):
+        hello_world = "++++++++++[>+++++++>++++++++++>+++>+<<<<-]>++.>+.+++++++..+++.>++.<<+++++++++++++++.>.+++.------.--------.>+.>."
+        self.assertEqual(codegen.evaluate(hello_world, ""), "Hello World!\n")
+        self.assertEqual(codegen.evaluate(",[.,]", b"\xffcat"), b"\xffcat")
+        programs = [hello_world, ",[.,]", "+[->>+<<]>>[-<+>]<.", "+[>+<]", "<<[-]+++[.-]", "+" + "[" * 30 + ".-" + "]" * 30]
+        for program in programs:
+            for pointer_policy in interpret.POINTER_POLICIES:
+                for budget in (3, 40, 2000):
+                    arguments = dict(timeout=budget, timeout_unit='steps', target="Hi", output_slack=1,
+                                     mismatch_bound=200, tape_size=4, pointer_policy=pointer_policy)
+                    results = []
+                    for evaluate in (interpret.evaluate, codegen.evaluate):
+                        try:
+                            results.append(evaluate(program, "ab", **arguments))
+                        except interpret.TimeoutAbortException as exception:
+                            results.append(('timeout', exception.steps))
+                        except interpret.TapeBoundsException as exception:
+                            results.append(('bounds', str(exception)))
+                    self.assertEqual(results[0], results[1], (program, pointer_policy, budget))
+        # Too deeply nested for Python to compile, so it is run by the interpreter
+        self.assertIsNone(codegen.generate_program(programs[-1]).function)
@@ -0,0 +1,148 @@
+from evolve_bf import evaluation, evolve, cost, cache, batch
+from collections import Counter
+import random
+import unittest
+
+
+class TestEvaluation(unittest.TestCase):
+    def test_process_matches_serial(self):
+        inputs, targets = ['ab', ''], ['ab', '']
+        population = evolve.generate_population(50, 8) + [',[.,]', '+[', '+[]']
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        with evaluation.make_evaluator(inputs, targets) as serial:
+            expected = serial.costs(population, cost_options)
+        with evaluation.make_evaluator(inputs, targets, 'process', workers=2, chunk_size=7) as pool:
+            self.assertEqual(pool.costs(population, cost_options), expected)
+        self.assertEqual(expected[-3:], [0, False, False])
+
+    def test_cache(self):
+        self.assertEqual(cache.normalize_program("+-+>< .<>,+"), "+.")
+        self.assertEqual(cache.normalize_program("+-+>< .<>,+", pointer_policy='wrap'), "+.")
+        self.assertEqual(cache.normalize_program("+-+>< .<>,+", pointer_policy='error'), "+><.<>")
+        cost_options = cost.default_cost_options._replace(program_timeout=100)
+        with evaluation.make_evaluator(['ab'], ['ab'], cache_size=10) as evaluator:
+            population = [',[.,]', ',[.,]+-', ',[.,]', '+[]']
+            self.assertEqual(evaluator.costs(population, cost_options), [0, 0, 0, False])
+            self.assertEqual((evaluator.cache.hits, evaluator.cache.misses), (2, 2))
+            self.assertEqual(evaluator.costs(population[:1], cost_options), [0])
+            self.assertEqual(evaluator.cache.hits, 3)
+
+    def test_cache_keeps_step_counts(self):
+        # Under a tight step budget, code that cannot change the output can still make a program time out
+        step_options = cost.default_cost_options._replace(program_timeout=30, timeout_unit='steps')
+        error_options = cost.default_cost_options._replace(pointer_policy='error', tape_size=2)
+        for cost_options, population in ((step_options, ['+.', '+.' + '+' * 40]), (error_options, ['+.', '+.>>'])):
+            with evaluation.make_evaluator(['a'], ['b']) as serial:
+                expected = serial.costs(population, cost_options)
+            self.assertIs(expected[1], False)
+            for ordered in (population, population[::-1]):
+                with evaluation.make_evaluator(['a'], ['b'], cache_size=10) as evaluator:
+                    self.assertEqual(evaluator.costs(ordered, cost_options), [expected[population.index(program)]
+                                                                              for program in ordered])
+
+    @unittest.skipIf(batch.numpy is None, "NumPy is not installed")
+    def test_numpy_matches_serial(self):
+        inputs, targets = ['ab', '', 'xyz'], ['ab', '', 'xyz']
+        population = evolve.generate_population(100, 12) + [',[.,]', '+[', '+[]', '++[->+>+<<]>.']
+        cost_options = cost.default_cost_options._replace(program_timeout=500, timeout_unit='steps', time_cost=True)
+        with evaluation.make_evaluator(inputs, targets) as serial:
+            expected = serial.costs(population, cost_options)
+        with evaluation.make_evaluator(inputs, targets, 'numpy') as lockstep:
+            self.assertEqual(lockstep.costs(population, cost_options), expected)
+
+    def test_stats(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        stats = Counter()
+        with evaluation.make_evaluator(['ab'], ['ab'], 'process', workers=2) as pool:
+            pool.costs([',[.,]', '+[', '+[]', '+['], cost_options, stats=stats)
+        self.assertEqual((stats['syntax_errors'], stats['timeouts']), (2, 1))
+        self.assertGreater(stats['steps'], 1000)
+
+    def test_cache_stats(self):
+        # Duplicates and cached programs count towards the causes of inviability, so they cover the whole population
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        population = ['+[', '+[', '+[]', '+[]', ',[.,]', '+[']
+        backends = ['serial', 'process'] + (['numpy'] if batch.numpy is not None else [])
+        for backend in backends:
+            with evaluation.make_evaluator(['ab'], ['ab'], backend, workers=2, cache_size=10) as evaluator:
+                for _ in range(2):
+                    stats, causes = Counter(), []
+                    evaluator.costs(population, cost_options, stats=stats, causes=causes)
+                    self.assertEqual((stats['syntax_errors'], stats['timeouts']), (3, 2))
+                    self.assertEqual(causes, ['syntax_errors'] * 2 + ['timeouts'] * 2 + [None, 'syntax_errors'])
+
+
+class TestCost(unittest.TestCase):
+    def test_bound(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        exact = cost.cost_function(['ab', 'cd'], ['ab', 'cd'], ',.', cost_options)
+        self.assertEqual(cost.cost_function(['ab', 'cd'], ['ab', 'cd'], ',.', cost_options, bound=exact), exact)
+        self.assertEqual(cost.cost_function(['ab', 'cd'], ['ab', 'cd'], ',.', cost_options, bound=exact - 1),
+                         cost.OVER_BOUND)
+        # A program that never halts is still run under a bound if it prints first, as a run can stop it for going over
+        programs = ['+++.+[]', '+' * 98 + '.+[]', '+[]']
+        expected = [cost.OVER_BOUND, False, False]
+        self.assertEqual([cost.cost_function(['a'], ['b'], program, cost_options, bound=50) for program in programs],
+                         expected)
+        if batch.numpy is not None:
+            self.assertEqual(cost.cost_function_batch(['a'], ['b'], programs, cost_options, bound=50), expected)
+
+    def test_bytes_mode_costs_match(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        for program in [',.', ',[.,]', '+++[.-]', '>', ',[.,]+.']:
+            self.assertEqual(cost.cost_function([b'ab', b'xyz'], [b'ab', b'Hi!'], program, cost_options),
+                             cost.cost_function(['ab', 'xyz'], ['ab', 'Hi!'], program, cost_options))
+
+    def test_prepared_suite(self):
+        random.seed(0)
+        programs = evolve.generate_population(300, 12) + ['', '+[.+]', ',[.,]']
+        for inputs, targets in ((['ab', 'xyz', ''], ['ba', 'zyx', '!']), ([b'ab', b'\xff'], [b'ba', b'\x00\x01'])):
+            cost_options = cost.default_cost_options._replace(timeout_unit='steps', program_timeout=200)
+            suite = cost.prepare_suite(inputs, targets, cost_options)
+            for bound in (None, 3000000):
+                expected = [cost.cost_function(inputs, targets, program, cost_options, bound) for program in programs]
+                self.assertEqual([cost.cost_function(inputs, targets, program, cost_options, bound, suite=suite)
+                                  for program in programs], expected)
+                self.assertEqual(cost.cost_function_batch(inputs, targets, programs, cost_options, bound, suite=suite),
+                                 expected)
+                codegen_options = cost_options._replace(interpreter='codegen')
+                self.assertEqual([cost.cost_function(inputs, targets, program, codegen_options, bound, suite=suite)
+                                  for program in programs], expected)
+            # A suite prepared with another cost table is not used
+            other_options = cost_options._replace(cost_table=dict(cost_options.cost_table, not_equal=7))
+            self.assertIsNot(cost.get_suite(inputs, targets, other_options, suite), suite)
+            self.assertIs(cost.get_suite(inputs, targets, cost_options._replace(time_cost=True), suite), suite)
+
+    def test_length_cost(self):
+        cost_options = cost.default_cost_options._replace(timeout_unit='steps', program_timeout=200)
+        length_options = cost_options._replace(length_cost=3)
+        for program in (',.', ',.>>>', '+', '>'):
+            plain = cost.cost_function(['a'], ['b'], program, cost_options)
+            self.assertEqual(cost.cost_function(['a'], ['b'], program, length_options), plain + 3 * len(program))
+            self.assertEqual(cost.cost_function_batch(['a'], ['b'], [program], length_options),
+                             [plain + 3 * len(program)])
+        # Correct programs still cost nothing
+        self.assertEqual(cost.cost_function(['a'], ['a'], ',.>>>', length_options), 0)
+        evaluator = evaluation.make_evaluator(['a'], ['b'], cache_size=100)
+        self.assertNotEqual(*evaluator.costs([',.', ',.>>>'], length_options))
+
+    def test_vectorized_scoring(self):
+        random.seed(0)
+        cost_options = cost.default_cost_options._replace(cost_table=dict(cost.default_cost_table, wrong_char=3))
+        target = 'Hello, world!\n' * 40
+        outputs = ['', target, target[:100], target + 'extra', '\u20ac' + target[1:], target[:-1] + '\u0100']
+        outputs += [''.join(chr(random.randrange(256)) for _ in range(random.randrange(1000))) for _ in range(20)]
+        for text_type in (str, bytes):
+            if text_type is bytes:
+                target = target.encode('utf-8')
+                outputs = [output.encode('utf-8') for output in outputs]
+            threshold = cost.NUMPY_SCORING_THRESHOLD
+            cost.NUMPY_SCORING_THRESHOLD = float('inf')  # Score char by char
+            try:
+                expected = [cost.score_output(output, target, cost_options) for output in outputs]
+            finally:
+                cost.NUMPY_SCORING_THRESHOLD = threshold
+            self.assertEqual(expected[1], 0)
+            self.assertEqual(cost.score_outputs(outputs, target, cost_options), expected)
+            self.assertEqual([cost.score_output(output, target, cost_options) for output in outputs], expected)
+        self.assertEqual(cost.output_mismatches(['', 'ab', 'abc', 'b'], 'ab'), [0, 0, ord('c'), 1])
@@ -0,0 +1,144 @@
+from evolve_bf import evolve, cost, batch, islands, metrics, interpret
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+
+class TestEvolution(unittest.TestCase):
+    @unittest.skipIf(batch.numpy is None, "NumPy is not installed")
+    def test_evolve_timeout_options(self):
+        # The budget set in EvolveOptions is the one programs are costed with
+        evolve_options = evolve.default_evolve_options._replace(population_size=50, program_timeout=1000,
+                                                                timeout_unit='steps', evaluation_backend='numpy')
+        self.assertEqual(evolve.get_cost_options(evolve_options),
+                         cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps'))
+        random.seed(0)
+        self.assertEqual(evolve.evolve_bf_program(['ab'], ['ab'], evolve_options).cost, 0)
+        # Left at None, they keep the budget set in cost_options
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        self.assertEqual(evolve.get_cost_options(evolve.default_evolve_options._replace(cost_options=cost_options)),
+                         cost_options)
+        self.assertEqual(evolve.get_cost_options(evolve.default_evolve_options), cost.default_cost_options)
+
+    def test_metrics_hook(self):
+        records = []
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=50, program_timeout=1000,
+                                                                timeout_unit='steps', cost_options=cost_options,
+                                                                metrics_hook=records.append)
+        random.seed(0)
+        report = evolve.evolve_bf_program(['ab'], ['ab'], evolve_options)
+        self.assertEqual([record.generation for record in records], list(range(report.generations + 1)))
+        self.assertEqual(records[-1].best_cost, 0)
+        self.assertTrue(all(record.population_size > 0 and record.evaluation_time >= 0 for record in records))
+        # Abandoned costs are written as null, as strict JSON has no infinity
+        sink_path = os.path.join(tempfile.mkdtemp(), 'metrics.jsonl')
+        metrics.JSONLSink(sink_path)(records[0]._replace(best_cost=cost.OVER_BOUND))
+        with open(sink_path) as sink_file:
+            self.assertIsNone(json.loads(sink_file.read())['best_cost'])
+
+    def test_verbose_uses_cost_options(self):
+        # The best program is printed with the output it was scored on, tape settings and all
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps',
+                                                          pointer_policy='wrap', tape_size=2)
+        evolve_options = evolve.default_evolve_options._replace(population_size=50, cost_options=cost_options,
+                                                                verbose=True, generation_limit=1)
+        random.seed(12)
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            report = evolve.evolve_bf_program(['ab'], ['ba'], evolve_options)
+        output = interpret.evaluate(report.program, 'ab', timeout=1000, timeout_unit='steps', tape_size=2,
+                                    pointer_policy='wrap')
+        self.assertNotEqual(output, interpret.evaluate(report.program, 'ab', timeout=1000, timeout_unit='steps'))
+        self.assertIn("\n{}\n{}\n".format(report.program, output), printed.getvalue())
+
+    def test_checkpoint_resume(self):
+        checkpoint_path = os.path.join(tempfile.mkdtemp(), 'run.ckpt')
+        cost_options = cost.default_cost_options._replace(program_timeout=2000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=100, program_timeout=2000,
+                                                                timeout_unit='steps', cost_options=cost_options,
+                                                                checkpoint_path=checkpoint_path, checkpoint_interval=2)
+        random.seed(1)
+        expected = evolve.evolve_bf_program(['ab', 'xyz'], ['ab', 'xyz'], evolve_options)
+        self.assertGreater(expected.generations, 2)
+
+        def interrupt(record):
+            if record.generation == 2:
+                raise KeyboardInterrupt
+        random.seed(1)
+        with self.assertRaises(KeyboardInterrupt):
+            evolve.evolve_bf_program(['ab', 'xyz'], ['ab', 'xyz'], evolve_options._replace(metrics_hook=interrupt))
+        random.seed(99)
+        self.assertEqual(evolve.resume_bf_program(checkpoint_path), expected)
+
+    def test_budgets(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=50, program_timeout=1000,
+                                                                timeout_unit='steps', cost_options=cost_options)
+        inputs, targets = ['hello world'], ['dlrow olleh']
+        random.seed(0)
+        report = evolve.evolve_bf_program(inputs, targets, evolve_options._replace(generation_limit=3))
+        self.assertEqual((report.stopped_by, report.generations), ('generation_limit', 3))
+        self.assertGreater(report.cost, 0)
+        self.assertEqual(report.cost, cost.cost_function(inputs, targets, report.program, cost_options))
+        random.seed(0)
+        report = evolve.evolve_bf_program(inputs, targets, evolve_options._replace(evaluation_limit=120))
+        self.assertEqual((report.stopped_by, report.generations), ('evaluation_limit', 3))
+        random.seed(0)
+        # Nothing has been evaluated when a budget of zero runs out
+        self.assertIsNone(evolve.evolve_bf_program(inputs, targets, evolve_options._replace(time_limit=0)))
+        random.seed(0)
+        report = evolve.evolve_bf_program(inputs, targets, evolve_options._replace(step_limit=1))
+        self.assertEqual((report.stopped_by, report.generations), ('step_limit', 1))
+        # Correct programs are still reported without a stopped_by
+        random.seed(0)
+        self.assertIsNone(evolve.evolve_bf_program(['ab'], ['ab'], evolve_options).stopped_by)
+
+    def test_elitism_low_cull_ratio(self):
+        # Culling hard breeds fewer programs than the elites leave room for
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=100, program_timeout=1000,
+                                                                timeout_unit='steps', cost_options=cost_options,
+                                                                cull_ratio=0.1, elitism=2, generation_limit=5)
+        random.seed(0)
+        report = evolve.evolve_bf_program(['hello world'], ['dlrow olleh'], evolve_options)
+        self.assertEqual((report.stopped_by, report.generations), ('generation_limit', 5))
+
+
+class TestIslands(unittest.TestCase):
+    def test_islands(self):
+        self.assertEqual(islands.get_neighbours(3, 4, 'ring'), [0])
+        self.assertEqual(islands.get_neighbours(1, 3, 'full'), [0, 2])
+        cost_options = cost.default_cost_options._replace(program_timeout=2000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=100, program_timeout=2000,
+                                                                timeout_unit='steps', cost_options=cost_options)
+        report = islands.island_evolve(['ab', 'xyz'], ['ab', 'xyz'], evolve_options, islands=2, migration_interval=2,
+                                       seed=0)
+        self.assertEqual(report.cost, 0)
+
+    def test_race(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=2000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=100, program_timeout=2000,
+                                                                timeout_unit='steps', cost_options=cost_options)
+        winner, report, generation_counts = islands.race_evolve(['ab', 'xyz'], ['ab', 'xyz'], evolve_options,
+                                                                attempts=3, seed=0)
+        self.assertEqual(report.cost, 0)
+        self.assertEqual(generation_counts[winner], report.generations)
+        self.assertEqual(len(generation_counts), 3)
+
+    def test_islands_fail_fast(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=2000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=100, program_timeout=2000,
+                                                                timeout_unit='steps', cost_options=cost_options)
+        with self.assertRaises(ValueError):
+            islands.island_evolve(['ab'], ['ab'], evolve_options._replace(checkpoint_path='run.ckpt'), islands=2)
+        with self.assertRaises(ValueError):
+            islands.race_evolve(['ab'], ['ab'], evolve_options._replace(checkpoint_path='run.ckpt'), attempts=2)
+        # An island that dies without reporting back is noticed, rather than waited on forever
+        with self.assertRaises(RuntimeError):
+            islands.race_evolve(['hello world'], ['dlrow olleh'],
+                                evolve_options._replace(metrics_hook=lambda record: os._exit(1)), attempts=2)
@@ -0,0 +1,44 @@
+from evolve_bf import evolve, cost, jobs
+import asyncio
+import tempfile
+import unittest
+
+
+class TestJobRunner(unittest.TestCase):
+    def test_job_runner(self):
+        cost_options = cost.default_cost_options._replace(program_timeout=1000, timeout_unit='steps')
+        evolve_options = evolve.default_evolve_options._replace(population_size=50, program_timeout=1000,
+                                                                timeout_unit='steps', cost_options=cost_options)
+
+        async def run_jobs():
+            async with jobs.JobRunner(concurrency=1, store=tempfile.mkdtemp()) as runner:
+                job = runner.submit(['ab'], ['ab'], evolve_options, seed=0)
+                records = [record async for record in job.progress()]
+                report = await job
+                self.assertEqual(report.cost, 0)
+                self.assertEqual([record.generation for record in records], list(range(report.generations + 1)))
+                # Solved specs are answered from the store, whatever the metrics_hook
+                again = runner.submit(['ab'], ['ab'], evolve_options._replace(metrics_hook=print))
+                self.assertEqual((await again, again.from_store), (report, True))
+                # Nor does where it is evaluated matter
+                again = runner.submit(['ab'], ['ab'], evolve_options._replace(evaluation_backend='process',
+                                                                              evaluation_workers=2,
+                                                                              fitness_cache_size=0))
+                self.assertEqual((await again, again.from_store), (report, True))
+
+                # Unsolved specs are evolved in a worker, so a hook that cannot be pickled must not reach it
+                hooked = runner.submit(['ba'], ['ab'], evolve_options._replace(metrics_hook=lambda record: None,
+                                                                               verbose=True), seed=0)
+                self.assertEqual(((await hooked).cost, hooked.from_store), (0, False))
+                with self.assertRaises(ValueError):
+                    runner.submit(['ab'], ['ab'], evolve_options._replace(checkpoint_path='checkpoint.pickle'))
+
+                running = runner.submit(['hello world'], ['dlrow olleh'], evolve_options)
+                waiting = runner.submit(['a'], ['b'], evolve_options)
+                await running.progress().__anext__()
+                for job in (running, waiting):
+                    job.cancel()
+                    with self.assertRaises(asyncio.CancelledError):
+                        await job
+                self.assertEqual([record async for record in waiting.progress()], [])
+        asyncio.run(run_jobs())
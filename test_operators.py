@@ -0,0 +1,76 @@
+from evolve_bf import evolve, cost, cross, mutate, analysis, population, selection
+import random
+import unittest
+
+
+class TestOperators(unittest.TestCase):
+    def test_operators_keep_brackets_balanced(self):
+        random.seed(0)
+        population = evolve.generate_population(200, 12) + ['+[-[>+<]]', '[[[]]]', ',[.,]']
+        for _ in range(2000):
+            program_a, program_b = random.choice(population), random.choice(population)
+            for child in cross.crossing_function(program_a, program_b) + (mutate.mutation_function(program_a),):
+                self.assertTrue(analysis.is_balanced(child), child)
+        self.assertEqual(cross.swap_loops("+[-]+", ".[>]", 1, 1), ("+[>]+", ".[-]"))
+        mutated = mutate.MutationEngine().mutate_population(population)
+        self.assertEqual(len(mutated), len(population))
+        self.assertTrue(all(analysis.is_balanced(child) for child in mutated))
+        no_mutation = mutate.default_mutate_options._replace(likelihood_of_inplace=0, likelihood_of_addition=0,
+                                                             likelihood_of_deletion=0)
+        self.assertEqual(mutate.MutationEngine(no_mutation).mutate_population(population[:50]), population[:50])
+
+
+class TestPopulation(unittest.TestCase):
+    def test_population(self):
+        programs = ['+[-]', '', '.,', '[[>]<]']
+        packed = population.Population.from_programs(programs)
+        self.assertEqual(len(packed), 4)
+        self.assertEqual(packed.programs(), programs)
+        self.assertEqual((packed[-1], packed[1:3]), ('[[>]<]', ['', '.,']))
+        self.assertEqual(packed.lengths(), [4, 0, 2, 6])
+        self.assertEqual(packed.select([3, 0, 3]).programs(), ['[[>]<]', '+[-]', '[[>]<]'])
+        random.seed(0)
+        generated = population.Population.generate(50, 10)
+        random.seed(0)
+        self.assertEqual(generated.programs(), evolve.generate_population(50, 10))
+        self.assertTrue(all(analysis.is_balanced(program) for program in generated))
+        children = generated.cross(generated.mutate(mutate.MutationEngine()))
+        self.assertEqual(len(children), 100)
+        self.assertTrue(all(analysis.is_balanced(program) for program in children))
+
+    def test_population_orders(self):
+        random.seed(0)
+        programs = evolve.generate_population(40, 12)
+        packed = population.Population.from_programs(programs)
+        random.seed(0)
+        shuffled = list(programs)
+        random.shuffle(shuffled)
+        random.seed(0)
+        self.assertEqual(packed.shuffled().programs(), shuffled)
+        partners = packed.mutate(mutate.MutationEngine())
+        order, partner_order = packed.shuffled_order(), packed.shuffled_order()
+        random.seed(0)
+        crossed = packed.select(order).cross(partners.select(partner_order))
+        random.seed(0)
+        self.assertEqual(packed.cross(partners, order, partner_order), crossed)
+
+
+class TestSelection(unittest.TestCase):
+    def test_selection(self):
+        costs = [5, 1, cost.OVER_BOUND, 3, 1, 0, 3]
+        by_cost = sorted(range(len(costs)), key=costs.__getitem__)
+        for threshold in (1, selection.NUMPY_SELECTION_THRESHOLD):
+            selection.NUMPY_SELECTION_THRESHOLD, old_threshold = threshold, selection.NUMPY_SELECTION_THRESHOLD
+            try:
+                for count in range(len(costs) + 1):
+                    self.assertEqual(selection.truncate(costs, count), by_cost[:count])
+            finally:
+                selection.NUMPY_SELECTION_THRESHOLD = old_threshold
+        self.assertEqual(selection.best_index(costs), 5)
+        random.seed(0)
+        for scheme in selection.SELECTION_SCHEMES:
+            survivors = selection.select_survivors(costs, 4, scheme, tournament_size=3)
+            self.assertEqual(len(survivors), 4)
+            self.assertEqual([costs[survivor] for survivor in survivors], sorted(costs[survivor] for survivor in survivors))
+        with self.assertRaises(ValueError):
+            selection.select_survivors(costs, 4, 'roulette')